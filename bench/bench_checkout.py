@@ -0,0 +1,212 @@
+"""Checkout pipeline: step-by-step pool calls vs prepare / Midtrans / finish.
+
+Seeds a scratch schema with products and, before every checkout, a few cart
+rows for the checking-out student, then runs --checkouts checkouts with
+--concurrency in flight over a --pool-size pool. Midtrans is an
+asyncio.sleep of --midtrans-latency-ms, so only the database side differs.
+
+    python -m bench.bench_checkout [--checkouts 2000] [--concurrency 50] [--pool-size 10]
+"""
+import argparse
+import asyncio
+import datetime as dt
+import os
+import statistics
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+from queries import STATEMENTS
+
+load_dotenv()
+
+SCHEMA = "bench_checkout"
+PRODUCTS = 20
+
+
+async def midtrans(latency):
+    await asyncio.sleep(latency)
+    return "https://app.sandbox.midtrans.com/snap/v2/vtweb/bench"
+
+
+async def stepwise(pool, nim, cart_ids, latency):
+    cart_details = await pool.fetch(
+        """
+        SELECT c.id AS cart_id, c.product_id, c.quantity, c.size, c.information,
+            p.name, p.img_url, p.price
+        FROM cart c
+        INNER JOIN product p ON c.product_id = p.id
+        WHERE c.id = ANY($1)
+        """,
+        cart_ids,
+    )
+    transaction_id = await pool.fetchval(
+        """
+        INSERT INTO transaction (mahasiswa_nim, transaction_date, paid, completed, status)
+        VALUES ($1, $2, false, false, 'pending')
+        RETURNING id
+        """,
+        nim,
+        dt.datetime.now(),
+    )
+    redirect_url = await midtrans(latency)
+    await pool.execute(
+        "UPDATE transaction SET payment_url = $1 WHERE id = $2",
+        redirect_url,
+        transaction_id,
+    )
+    await pool.executemany(
+        """
+        INSERT INTO "order" (
+            mahasiswa_nim, product_id, quantity, size, information, transaction_id)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        """,
+        [
+            (
+                nim,
+                cart["product_id"],
+                cart["quantity"],
+                cart["size"],
+                cart["information"],
+                transaction_id,
+            )
+            for cart in cart_details
+        ],
+    )
+    await pool.execute("DELETE FROM cart WHERE id = ANY($1)", cart_ids)
+    return 5
+
+
+async def pipelined(pool, nim, cart_ids, latency):
+    cart_details = await pool.fetch(
+        STATEMENTS["checkout_prepare"], nim, dt.datetime.now(), cart_ids
+    )
+    transaction_id = cart_details[0]["transaction_id"]
+    redirect_url = await midtrans(latency)
+    await pool.execute(STATEMENTS["checkout_finish"], redirect_url, transaction_id)
+    return 2
+
+
+async def seed(con):
+    await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await con.execute(f"CREATE SCHEMA {SCHEMA}")
+    await con.execute(f"SET search_path TO {SCHEMA}")
+    await con.execute(
+        """
+        CREATE TABLE product (
+            id serial PRIMARY KEY, name text NOT NULL, price integer NOT NULL,
+            description text NOT NULL, img_url text NOT NULL
+        );
+        CREATE TABLE cart (
+            id serial PRIMARY KEY, mahasiswa_nim bigint NOT NULL,
+            product_id integer NOT NULL REFERENCES product (id),
+            quantity integer NOT NULL, size text NOT NULL, information text
+        );
+        CREATE INDEX ON cart (mahasiswa_nim);
+        CREATE TABLE transaction (
+            id serial PRIMARY KEY, mahasiswa_nim bigint NOT NULL,
+            transaction_date timestamp NOT NULL,
+            paid boolean NOT NULL DEFAULT false,
+            completed boolean NOT NULL DEFAULT false,
+            payment_url text, status text NOT NULL
+        );
+        CREATE TABLE "order" (
+            id serial PRIMARY KEY, mahasiswa_nim bigint NOT NULL,
+            product_id integer NOT NULL REFERENCES product (id),
+            quantity integer NOT NULL, size text NOT NULL, information text,
+            transaction_id integer REFERENCES transaction (id) ON DELETE CASCADE
+        );
+        CREATE INDEX ON "order" (transaction_id);
+        """
+    )
+    await con.execute(
+        """
+        INSERT INTO product (name, price, description, img_url)
+        SELECT 'Merch ' || g, 50000 + g * 1000, 'Official HMTK merch', 'https://cdn.example/' || g
+        FROM generate_series(1, $1) g
+        """,
+        PRODUCTS,
+    )
+
+
+async def run(pool, checkout, args):
+    queue = asyncio.Queue()
+    for i in range(args.checkouts):
+        queue.put_nowait(1301190000 + i)
+
+    latencies = []
+    round_trips = 0
+
+    async def worker():
+        nonlocal round_trips
+        while not queue.empty():
+            nim = queue.get_nowait()
+            cart_ids = await pool.fetchval(
+                """
+                WITH added AS (
+                    INSERT INTO cart (mahasiswa_nim, product_id, quantity, size)
+                    SELECT $1, 1 + (g * 7) % $3, 1 + g % 3, 'm'
+                    FROM generate_series(1, $2) g
+                    RETURNING id
+                )
+                SELECT array_agg(id) FROM added
+                """,
+                nim,
+                args.items,
+                PRODUCTS,
+            )
+            start = time.perf_counter()
+            trips = await checkout(pool, nim, cart_ids, args.midtrans_latency_ms / 1000)
+            round_trips += trips
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return elapsed, sorted(latencies), round_trips
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkouts", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--midtrans-latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    connect = dict(
+        host=os.getenv("DBHOST"),
+        port=os.getenv("PGPORT"),
+        database=os.getenv("DBNAME"),
+        user=os.getenv("DBUSER"),
+        password=os.getenv("DBPASS"),
+    )
+    con = await asyncpg.connect(**connect)
+    try:
+        for name, checkout in [("stepwise", stepwise), ("pipelined", pipelined)]:
+            # fresh tables and statistics for each, so the order doesn't matter
+            await seed(con)
+            pool = await asyncpg.create_pool(
+                **connect,
+                min_size=args.pool_size,
+                max_size=args.pool_size,
+                server_settings={"search_path": SCHEMA},
+            )
+            try:
+                elapsed, latencies, round_trips = await run(pool, checkout, args)
+            finally:
+                await pool.close()
+            print(
+                f"{name:>9}: {args.checkouts / elapsed:7.1f} checkouts/s"
+                f"  p50 {statistics.median(latencies):7.2f} ms"
+                f"  p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms"
+                f"  {round_trips / args.checkouts:.0f} round trips each"
+            )
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
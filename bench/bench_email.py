@@ -0,0 +1,62 @@
+"""Delivers a burst of emails through EmailOutbox to a local aiosmtpd sink.
+
+    python -m bench.bench_email --emails 1000
+"""
+import argparse
+import asyncio
+import time
+
+from aiosmtpd.controller import Controller
+
+from mailer import EmailOutbox
+
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=args.port)
+    controller.start()
+
+    outbox = EmailOutbox(
+        host="127.0.0.1",
+        port=args.port,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    await outbox.start()
+
+    start = time.perf_counter()
+    for i in range(args.emails):
+        outbox.enqueue(
+            "no_reply@mail.myhmtk.jeyy.xyz",
+            [f"student{i}@example.com"],
+            f"Subject: bench {i}\n\nbench email {i}\n",
+        )
+    enqueued = time.perf_counter() - start
+    await outbox.close(drain_timeout=120)
+    elapsed = time.perf_counter() - start
+    controller.stop()
+
+    print(f"enqueue: {enqueued * 1e6 / args.emails:.1f} us/email")
+    print(f"delivered {sink.received}/{args.emails} in {elapsed:.2f}s ({sink.received / elapsed:.0f}/s)")
+    if sink.received != args.emails:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
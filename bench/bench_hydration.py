@@ -0,0 +1,96 @@
+"""Row to model hydration: validated constructors vs model.hydrate.
+
+Builds 10k post feed rows shaped like the feed query's records (plain
+dicts share the Record lookup interface) and times turning them into
+Post models the way the handlers used to, field by field through pydantic
+validation, and with model.hydrate.
+
+    python -m bench.bench_hydration [--rows 10000] [--rounds 5]
+"""
+import argparse
+import datetime as dt
+import statistics
+import time
+
+from model import Post, Student, hydrate
+
+
+def rows(count):
+    now = dt.datetime(2023, 5, 1, 12, 0, 0)
+    return [
+        {
+            "id": i,
+            "poster_id": 1301190000 + i % 500,
+            "post_date": now - dt.timedelta(minutes=i),
+            "img_url": None,
+            "content": "Lorem ipsum dolor sit amet " * 8,
+            "can_comment": True,
+            "mahasiswa_name": f"Student {i % 500}",
+            "mahasiswa_tel": 628100000000 + i % 500,
+            "mahasiswa_email": f"{i % 500}@student.test",
+            "mahasiswa_avatar_url": "https://cdn.example/avatar.png",
+            "mahasiswa_address": "Jl. Telekomunikasi No. 1, Bandung",
+            "mahasiswa_pass_hash": "0" * 64,
+            "current_like_count": i % 50,
+            "comment_count": 0,
+            "latest_comments": None,
+        }
+        for i in range(count)
+    ]
+
+
+def validated(post):
+    poster = Student(
+        nim=post["poster_id"],
+        name=post["mahasiswa_name"],
+        tel=post["mahasiswa_tel"],
+        email=post["mahasiswa_email"],
+        avatar_url=post["mahasiswa_avatar_url"],
+        address=post["mahasiswa_address"],
+        pass_hash=post["mahasiswa_pass_hash"],
+    )
+    return Post(
+        id=post["id"],
+        poster=poster,
+        post_date=post["post_date"],
+        img_url=post["img_url"],
+        content=post["content"],
+        current_like_count=post["current_like_count"],
+        can_comment=post["can_comment"],
+        comment_count=post["comment_count"],
+        latest_comments=post["latest_comments"],
+    )
+
+
+def hydrated(post):
+    poster = hydrate(Student, post, prefix="mahasiswa_", columns={"nim": "poster_id"})
+    return hydrate(Post, post, poster=poster)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    data = rows(args.rows)
+    assert [validated(row).dict() for row in data[:100]] == [
+        hydrated(row).dict() for row in data[:100]
+    ]
+
+    for name, build in [("validated", validated), ("hydrate", hydrated)]:
+        samples = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for row in data:
+                build(row)
+            samples.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(samples)
+        print(
+            f"{name:>9}: {median:8.2f} ms for {args.rows} rows"
+            f"  ({median * 1000 / args.rows:5.2f} us/row)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Feed latency with 1M likes, COUNT(DISTINCT) join vs post.like_count.
+
+Seeds a scratch schema on the database configured in .env (DBHOST, DBNAME,
+DBUSER, DBPASS), times both feed queries and drops the schema again.
+
+    python bench/bench_like_count.py [--posts 5000] [--likes 1000000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA = "bench_like_count"
+
+BEFORE = """
+    SELECT
+        post.id, post.poster_id, post.post_date, post.img_url, post.content,
+        post.can_comment, mahasiswa.name, mahasiswa.tel, mahasiswa.email,
+        mahasiswa.avatar_url, mahasiswa.address, mahasiswa.pass_hash,
+        COUNT(DISTINCT l.liker_id) AS current_like_count
+    FROM post
+    LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
+    LEFT JOIN "like" l ON post.id = l.post_id
+    GROUP BY
+        post.id, mahasiswa.name, mahasiswa.tel, mahasiswa.email,
+        mahasiswa.avatar_url, mahasiswa.address, mahasiswa.pass_hash
+    ORDER BY post.post_date DESC
+"""
+
+AFTER = """
+    SELECT
+        post.id, post.poster_id, post.post_date, post.img_url, post.content,
+        post.can_comment, mahasiswa.name, mahasiswa.tel, mahasiswa.email,
+        mahasiswa.avatar_url, mahasiswa.address, mahasiswa.pass_hash,
+        post.like_count AS current_like_count
+    FROM post
+    LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
+    ORDER BY post.post_date DESC
+"""
+
+
+async def seed(con, posts, likes):
+    await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await con.execute(f"CREATE SCHEMA {SCHEMA}")
+    await con.execute(f"SET search_path TO {SCHEMA}")
+    await con.execute(
+        """
+        CREATE TABLE mahasiswa (
+            nim bigint PRIMARY KEY, name text, tel bigint, email text,
+            avatar_url text, address text, pass_hash text
+        );
+        CREATE TABLE post (
+            id serial PRIMARY KEY, poster_id bigint, post_date timestamp,
+            img_url text, content text, can_comment boolean,
+            like_count integer NOT NULL DEFAULT 0
+        );
+        CREATE TABLE "like" (
+            post_id integer, liker_id bigint, PRIMARY KEY (post_id, liker_id)
+        );
+        """
+    )
+    students = likes // posts + 1
+    await con.execute(
+        """
+        INSERT INTO mahasiswa
+        SELECT g, 'student ' || g, 62800000 + g, g || '@student.test', '-', '-', '-'
+        FROM generate_series(1, $1) g
+        """,
+        students,
+    )
+    await con.execute(
+        """
+        INSERT INTO post (poster_id, post_date, content, can_comment)
+        SELECT 1 + g % $2, now() - g * interval '1 minute', 'post ' || g, true
+        FROM generate_series(1, $1) g
+        """,
+        posts,
+        students,
+    )
+    await con.execute(
+        """
+        INSERT INTO "like" (post_id, liker_id)
+        SELECT 1 + g % $2, 1 + g / $2
+        FROM generate_series(0, $1 - 1) g
+        """,
+        likes,
+        posts,
+    )
+    await con.execute(
+        """
+        UPDATE post SET like_count = counted.n
+        FROM (SELECT post_id, COUNT(*) AS n FROM "like" GROUP BY post_id) counted
+        WHERE post.id = counted.post_id
+        """
+    )
+    await con.execute("ANALYZE")
+
+
+async def timed(con, query, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await con.fetch(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    con = await asyncpg.connect(
+        host=os.getenv("DBHOST"),
+        database=os.getenv("DBNAME"),
+        user=os.getenv("DBUSER"),
+        password=os.getenv("DBPASS"),
+    )
+    try:
+        await seed(con, args.posts, args.likes)
+        for name, query in [("before", BEFORE), ("after", AFTER)]:
+            samples = await timed(con, query, args.rounds)
+            print(
+                f"{name:>6}: median {statistics.median(samples):8.2f} ms"
+                f"  max {max(samples):8.2f} ms"
+            )
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""Like storm: hundreds of concurrent toggles on one post, then a count check.
+
+Runs against a live server. Every student in --users toggles the like on
+--post a random number of times, all requests in flight at once. Afterwards
+each student's is_liked and the post's current_like_count must match the
+parity of that student's toggles, and each student's responses must
+alternate between liked and unliked; the script exits non-zero otherwise.
+
+    python bench/bench_like_toggle.py --post 1 --users 101,102,103 --toggles 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--post", type=int, required=True)
+    parser.add_argument("--users", required=True, help="comma separated nims")
+    parser.add_argument("--toggles", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users = [int(nim) for nim in args.users.split(",")]
+    headers = {"Authorization": f"Bearer {os.getenv('SECRET_KEY')}"}
+    limits = httpx.Limits(max_connections=args.toggles)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, headers=headers, limits=limits, timeout=60
+    ) as client:
+        initial = {}
+        for nim in users:
+            resp = await client.get(f"/post/{args.post}", params={"user_id": nim})
+            resp.raise_for_status()
+            initial[nim] = resp.json()["post"]["is_liked"]
+            start_count = resp.json()["post"]["current_like_count"]
+
+        rng = random.Random(args.seed)
+        plan = [rng.choice(users) for _ in range(args.toggles)]
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(
+                client.post(f"/post/{args.post}/like", params={"user_id": nim})
+                for nim in plan
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        failed = [resp for resp in responses if resp.status_code != 200]
+
+        mismatched = []
+        expected = start_count
+        for nim in users:
+            toggles = plan.count(nim)
+            flipped = toggles % 2 == 1
+            if flipped:
+                expected += -1 if initial[nim] else 1
+
+            # starting from initial, every other toggle answers liked
+            liked = sum(
+                resp.json()["is_liked"]
+                for plan_nim, resp in zip(plan, responses)
+                if plan_nim == nim and resp.status_code == 200
+            )
+            expected_liked = toggles // 2 if initial[nim] else (toggles + 1) // 2
+
+            resp = await client.get(f"/post/{args.post}", params={"user_id": nim})
+            resp.raise_for_status()
+            is_liked = resp.json()["post"]["is_liked"]
+            if liked != expected_liked or is_liked != (initial[nim] != flipped):
+                mismatched.append(
+                    f"{nim}: {toggles} toggles, {liked} liked responses"
+                    f" (expected {expected_liked}), is_liked {is_liked}"
+                )
+
+        resp = await client.get(f"/post/{args.post}")
+        resp.raise_for_status()
+        actual = resp.json()["post"]["current_like_count"]
+
+    print(f"{args.toggles} toggles in {elapsed:.2f}s ({args.toggles / elapsed:.0f} req/s)")
+    print(f"failed requests: {len(failed)}")
+    print(f"like count: expected {expected}, got {actual}")
+    for line in mismatched:
+        print(f"parity mismatch {line}")
+    if failed or mismatched or actual != expected:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""Auth gate overhead: BaseHTTPMiddleware vs the pure ASGI MyHMTKMiddleware.
+
+Drives a trivial route in-process through httpx's ASGI transport, so only
+the app stack is measured, once behind the previous BaseHTTPMiddleware
+gate and once behind util.MyHMTKMiddleware.
+
+    python -m bench.bench_middleware [--requests 20000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from util import MyHMTKMiddleware
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY") or "bench"
+
+
+class LegacyMiddleware(BaseHTTPMiddleware):
+    # the gate as it was before the ASGI rewrite
+    async def dispatch(self, request: Request, call_next):
+        if self.need_auth(request.url.path):
+            authorization = request.headers.get("Authorization")
+            scheme, credentials = get_authorization_scheme_param(authorization)
+
+            if not (authorization and scheme and credentials):
+                return JSONResponse(
+                    status_code=403, content={"detail": "Not authenticated"}
+                )
+            if scheme.lower() != "bearer" or credentials != SECRET_KEY:
+                return JSONResponse(
+                    status_code=403,
+                    content={"detail": "Invalid authentication credentials"},
+                )
+
+        return await call_next(request)
+
+    def need_auth(self, path):
+        print(path)
+        return not any(
+            path.startswith(x)
+            for x in [
+                "/docs",
+                "/openapi.json",
+                "/reset_password",
+                "/transaction/midtrans_callback",
+                "/transaction/success",
+                "/transaction/pending",
+                "/transaction/midtrans_notification",
+            ]
+        )
+
+
+def build_app(middleware):
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"success": True}
+
+    return app
+
+
+async def run(app, total, concurrency):
+    headers = {"Authorization": f"Bearer {SECRET_KEY}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=headers
+    ) as client:
+        resp = await client.get("/ping")
+        assert resp.status_code == 200, resp.text
+
+        async def worker(n):
+            for _ in range(n):
+                await client.get("/ping")
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker(total // concurrency) for _ in range(concurrency))
+        )
+        return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    # MyHMTKMiddleware reads the secret at import time through util
+    import util
+
+    util.SECRET_KEY = SECRET_KEY
+    total = args.requests // args.concurrency * args.concurrency
+
+    for name, middleware in [
+        ("BaseHTTPMiddleware", LegacyMiddleware),
+        ("ASGI", MyHMTKMiddleware),
+    ]:
+        app = build_app(middleware)
+        # the legacy gate prints every path
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = await run(app, total, args.concurrency)
+        print(f"{name:>18}: {total / elapsed:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
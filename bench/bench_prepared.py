@@ -0,0 +1,139 @@
+"""The query registry vs the same SQL run as a raw string.
+
+Runs the post_feed_page query on fresh pools with asyncpg's default settings,
+once as a raw string on the asyncpg pool and once through queries.fetch on
+db's Pool wrapper, against a scratch schema on the database configured in
+.env. Reports the first execution on each new connection, which parses and
+plans on both paths, and steady state, where both hit asyncpg's statement
+cache; the difference left is the registry's own bookkeeping.
+
+    python -m bench.bench_prepared [--rounds 5000] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import datetime as dt
+import os
+import statistics
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+import queries
+from queries import STATEMENTS
+from util import Pool, db
+
+load_dotenv()
+
+SCHEMA = "bench_prepared"
+QUERY = STATEMENTS["post_feed_page"]
+FIRST_PAGE = (dt.datetime.max, 0, 20, 3)
+
+
+async def setup(con):
+    await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await con.execute(f"CREATE SCHEMA {SCHEMA}")
+    await con.execute(
+        f"""
+        SET search_path TO {SCHEMA};
+        CREATE TABLE mahasiswa (
+            nim bigint PRIMARY KEY, name text, tel bigint, email text,
+            avatar_url text, address text, pass_hash text
+        );
+        CREATE TABLE post (
+            id serial PRIMARY KEY, poster_id bigint, post_date timestamp,
+            img_url text, content text, can_comment boolean,
+            like_count integer NOT NULL DEFAULT 0
+        );
+        CREATE TABLE comment (
+            id serial PRIMARY KEY, post_id integer, commenter_id bigint,
+            comment_date timestamp, content text
+        );
+        CREATE INDEX ON post (post_date DESC, id DESC);
+        CREATE INDEX ON comment (post_id, comment_date, id);
+        INSERT INTO mahasiswa
+        SELECT g, 'student ' || g, 62800000 + g, g || '@student.test', '-', '-', '-'
+        FROM generate_series(1, 1000) g;
+        INSERT INTO post (poster_id, post_date, content, can_comment)
+        SELECT 1 + g % 1000, now() - g * interval '1 minute', 'post ' || g, true
+        FROM generate_series(1, 5000) g;
+        INSERT INTO comment (post_id, commenter_id, comment_date, content)
+        SELECT 1 + g % 5000, 1 + g % 1000, now() - g * interval '1 second', 'nice'
+        FROM generate_series(1, 20000) g;
+        ANALYZE;
+        """
+    )
+
+
+async def raw(con):
+    return await con.fetch(QUERY, *FIRST_PAGE)
+
+
+async def registry(con):
+    return await queries.fetch("post_feed_page", *FIRST_PAGE, con=con)
+
+
+async def first_queries(pool, run, concurrency):
+    # every connection is fresh, so each one runs the query for the first time
+    async def one():
+        async with pool.acquire() as con:
+            start = time.perf_counter()
+            await run(con)
+            elapsed = (time.perf_counter() - start) * 1000
+            await asyncio.sleep(0.05)  # keep it checked out so others get new ones
+            return elapsed
+
+    return await asyncio.gather(*(one() for _ in range(concurrency)))
+
+
+async def steady(pool, run, rounds, concurrency):
+    async def worker(n):
+        for _ in range(n):
+            async with pool.acquire() as con:
+                await run(con)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(rounds // concurrency) for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    connect = dict(
+        host=os.getenv("DBHOST"),
+        database=os.getenv("DBNAME"),
+        user=os.getenv("DBUSER"),
+        password=os.getenv("DBPASS"),
+    )
+    con = await asyncpg.connect(**connect)
+    await setup(con)
+
+    try:
+        for name, run in [("raw", raw), ("registry", registry)]:
+            pool = await asyncpg.create_pool(
+                min_size=args.concurrency,
+                max_size=args.concurrency,
+                server_settings={"search_path": SCHEMA},
+                **connect,
+            )
+            if run is registry:
+                # what db.create_pool hands the routes
+                pool = db.pool = Pool(pool)
+            first = await first_queries(pool, run, args.concurrency)
+            elapsed = await steady(pool, run, args.rounds, args.concurrency)
+            await pool.close()
+            print(
+                f"{name:>8}: first query {statistics.median(first):6.2f} ms,"
+                f" then {args.rounds / elapsed:7.0f} queries/s"
+            )
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+"""Response serialization: FastAPI's default path vs FastRoute + orjson.
+
+Serves prebuilt GetAllPostResponse, GetAllTransactionResponse and
+GetAllStudentResponse payloads from two in-process apps, one on stock
+APIRoute / JSONResponse and one on util.FastRoute / FastJSONResponse,
+and reports the median request time of each. Bodies are checked to decode
+to the same JSON.
+
+    python -m bench.bench_serialization [--items 500] [--rounds 200]
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import statistics
+import time
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from model import (
+    Comment,
+    GetAllPostResponse,
+    GetAllStudentResponse,
+    GetAllTransactionResponse,
+    Order,
+    Post,
+    Product,
+    Student,
+    Transaction,
+)
+from util import FastJSONResponse, FastRoute
+
+
+def student(i):
+    return Student(
+        nim=1301190000 + i,
+        name=f"Student {i}",
+        tel=628100000000 + i,
+        email=f"{i}@student.test",
+        avatar_url=f"https://cdn.example/avatar/{i}.png",
+        address="Jl. Telekomunikasi No. 1, Bandung",
+        pass_hash="0" * 64,
+    )
+
+
+def payloads(items):
+    now = dt.datetime(2023, 5, 1, 12, 0, 0, 123456)
+    students = [student(i) for i in range(items)]
+    product = Product(
+        id=1, name="Jaket HMTK", price=150000, description="Official", img_url="-"
+    )
+
+    posts = GetAllPostResponse(
+        success=True,
+        message="Berhasil mengambil semua post",
+        posts=[
+            Post(
+                id=i,
+                poster=students[i],
+                post_date=now - dt.timedelta(minutes=i),
+                img_url=None,
+                content="Lorem ipsum dolor sit amet " * 8,
+                current_like_count=i % 50,
+                can_comment=True,
+                is_liked=i % 2 == 0,
+                comment_count=3,
+                latest_comments=[
+                    Comment(
+                        id=i * 3 + c,
+                        post_id=i,
+                        commenter=students[(i + c) % items],
+                        comment_date=now,
+                        content="Mantap",
+                    )
+                    for c in range(3)
+                ],
+            )
+            for i in range(items)
+        ],
+        next_cursor="eyJkIjoiMjAyMy0wNS0wMSIsImkiOjF9",
+    )
+
+    transactions = GetAllTransactionResponse(
+        success=True,
+        message="Berhasil mengambil semua transaksi",
+        transactions=[
+            Transaction(
+                id=i,
+                student=students[i],
+                orders=[
+                    Order(id=i * 3 + o, product=product, quantity=1, size="m")
+                    for o in range(3)
+                ],
+                transaction_date=now,
+                paid=True,
+                completed=False,
+                payment_url="https://app.sandbox.midtrans.com/snap/v2/vtweb/x",
+                status="settlement",
+            )
+            for i in range(items)
+        ],
+        next_cursor=None,
+        total=items,
+    )
+
+    mahasiswa = GetAllStudentResponse(
+        success=True, message="Berhasil mengambil semua mahasiswa", mahasiswa=students
+    )
+    return {"/posts": posts, "/transactions": transactions, "/students": mahasiswa}
+
+
+def build_app(bodies, route_class, response_class):
+    router = APIRouter(route_class=route_class)
+    for path, body in bodies.items():
+
+        async def endpoint(body=body):
+            return body
+
+        router.add_api_route(path, endpoint, response_model=type(body))
+
+    app = FastAPI(default_response_class=response_class)
+    app.include_router(router)
+    return app
+
+
+async def measure(app, path, rounds):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        body = (await client.get(path)).content
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await client.get(path)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), body
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    bodies = payloads(args.items)
+    stock = build_app(bodies, APIRoute, JSONResponse)
+    fast = build_app(bodies, FastRoute, FastJSONResponse)
+
+    for path in bodies:
+        before, expected = await measure(stock, path, args.rounds)
+        after, actual = await measure(fast, path, args.rounds)
+        assert json.loads(expected) == json.loads(actual), path
+        print(
+            f"{path:>14}: {before:7.2f} ms -> {after:7.2f} ms"
+            f"  ({before / after:4.1f}x, {len(actual) / 1024:.0f} KiB)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
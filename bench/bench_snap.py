@@ -0,0 +1,59 @@
+"""Checkout-style load on SnapClient against bench/midtrans_stub.py.
+
+    python -m bench.bench_snap --url http://127.0.0.1:8001/snap/v1/transactions --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from midtrans import SnapClient, SnapError
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8001/snap/v1/transactions")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    client = SnapClient(
+        server_key="stub",
+        url=args.url,
+        max_connections=args.concurrency,
+        max_concurrency=args.concurrency,
+    )
+    await client.start()
+
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        payload = {
+            "transaction_details": {"order_id": f"bench-{time.time_ns()}-{i}", "gross_amount": 5000},
+            "item_details": [{"id": 0, "price": 5000, "name": "Biaya Admin", "quantity": 1}],
+        }
+        start = time.perf_counter()
+        try:
+            await client.create_transaction_redirect_url(payload)
+        except SnapError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    latencies.sort()
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s), {errors} errors")
+    print(
+        f"p50 {statistics.median(latencies):.1f} ms"
+        f"  p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms"
+        f"  max {latencies[-1]:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
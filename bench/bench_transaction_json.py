@@ -0,0 +1,227 @@
+"""Student transaction listing: flat rows + Python fan-in vs json_agg.
+
+Seeds a scratch schema with one student owning --transactions transactions
+of --orders orders each, then measures latency and peak Python memory of
+fetching and hydrating GetAllStudentTransactionResponse both ways.
+
+    python -m bench.bench_transaction_json [--transactions 500] [--orders 3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import asyncpg
+from dotenv import load_dotenv
+
+from model import GetAllStudentTransactionResponse, Order, StudentTransaction
+
+load_dotenv()
+
+SCHEMA = "bench_transaction_json"
+NIM = 1301190001
+
+FLAT = """
+    SELECT
+        t.id AS transaction_id, t.transaction_date, t.paid, t.completed,
+        t.payment_url, t.status,
+        o.id AS order_id, o.product_id, o.quantity, o.size, o.information,
+        p.name AS product_name, p.price AS product_price,
+        p.description AS product_description, p.img_url AS product_img_url
+    FROM transaction t
+    JOIN "order" o ON t.id = o.transaction_id
+    JOIN product p ON o.product_id = p.id
+    WHERE t.mahasiswa_nim = $1
+    ORDER BY transaction_date DESC
+"""
+
+NESTED = """
+    SELECT
+        t.id, t.transaction_date, t.paid, t.completed, t.payment_url, t.status,
+        COALESCE(
+            (
+                SELECT json_agg(
+                    json_build_object(
+                        'id', o.id,
+                        'product', json_build_object(
+                            'id', p.id, 'name', p.name, 'price', p.price,
+                            'description', p.description, 'img_url', p.img_url
+                        ),
+                        'quantity', o.quantity,
+                        'size', o.size,
+                        'information', o.information
+                    )
+                    ORDER BY o.id
+                )
+                FROM "order" o
+                JOIN product p ON o.product_id = p.id
+                WHERE o.transaction_id = t.id
+            ),
+            '[]'
+        ) AS orders
+    FROM transaction t
+    WHERE t.mahasiswa_nim = $1
+        AND EXISTS (SELECT 1 FROM "order" WHERE transaction_id = t.id)
+    ORDER BY t.transaction_date DESC
+"""
+
+
+async def flat(con):
+    rows = await con.fetch(FLAT, NIM)
+    transactions = {}
+    for row in rows:
+        transaction = transactions.setdefault(
+            row["transaction_id"],
+            {
+                "id": row["transaction_id"],
+                "transaction_date": row["transaction_date"],
+                "paid": row["paid"],
+                "completed": row["completed"],
+                "payment_url": row["payment_url"],
+                "status": row["status"],
+                "orders": [],
+            },
+        )
+        transaction["orders"].append(
+            Order(
+                id=row["order_id"],
+                product={
+                    "id": row["product_id"],
+                    "name": row["product_name"],
+                    "price": row["product_price"],
+                    "description": row["product_description"],
+                    "img_url": row["product_img_url"],
+                },
+                quantity=row["quantity"],
+                size=row["size"],
+                information=row["information"],
+            )
+        )
+    return GetAllStudentTransactionResponse(
+        success=True,
+        message="",
+        transactions=[StudentTransaction(**t) for t in transactions.values()],
+    )
+
+
+async def nested(con):
+    rows = await con.fetch(NESTED, NIM)
+    return GetAllStudentTransactionResponse(
+        success=True,
+        message="",
+        transactions=[
+            StudentTransaction(
+                id=row["id"],
+                orders=row["orders"],
+                transaction_date=row["transaction_date"],
+                paid=row["paid"],
+                completed=row["completed"],
+                payment_url=row["payment_url"],
+                status=row["status"],
+            )
+            for row in rows
+        ],
+    )
+
+
+async def seed(con, transactions, orders):
+    await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await con.execute(f"CREATE SCHEMA {SCHEMA}")
+    await con.execute(f"SET search_path TO {SCHEMA}")
+    await con.execute(
+        """
+        CREATE TABLE product (
+            id serial PRIMARY KEY, name text, price integer,
+            description text, img_url text
+        );
+        CREATE TABLE transaction (
+            id serial PRIMARY KEY, mahasiswa_nim bigint, transaction_date timestamp,
+            paid boolean, completed boolean, payment_url text, status text
+        );
+        CREATE TABLE "order" (
+            id serial PRIMARY KEY, mahasiswa_nim bigint, product_id integer,
+            quantity integer, size text, information text, transaction_id integer
+        );
+        CREATE INDEX ON transaction (mahasiswa_nim, transaction_date DESC);
+        CREATE INDEX ON "order" (transaction_id);
+        """
+    )
+    await con.execute(
+        """
+        INSERT INTO product (name, price, description, img_url)
+        SELECT 'Merch ' || g, 50000 + g * 1000, 'Official HMTK merch', 'https://cdn.example/' || g
+        FROM generate_series(1, 20) g
+        """
+    )
+    await con.execute(
+        """
+        INSERT INTO transaction
+            (mahasiswa_nim, transaction_date, paid, completed, payment_url, status)
+        SELECT $1, now() - g * interval '1 hour', true, g % 2 = 0,
+            'https://app.sandbox.midtrans.com/snap/v2/vtweb/' || g, 'settlement'
+        FROM generate_series(1, $2) g
+        """,
+        NIM,
+        transactions,
+    )
+    await con.execute(
+        """
+        INSERT INTO "order"
+            (mahasiswa_nim, product_id, quantity, size, information, transaction_id)
+        SELECT $1, 1 + (t.id + g) % 20, 1 + g % 3, 'm', NULL, t.id
+        FROM transaction t, generate_series(1, $2) g
+        """,
+        NIM,
+        orders,
+    )
+    await con.execute("ANALYZE")
+
+
+async def measure(con, reader, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await reader(con)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    await reader(con)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return samples, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    con = await asyncpg.connect(
+        host=os.getenv("DBHOST"),
+        database=os.getenv("DBNAME"),
+        user=os.getenv("DBUSER"),
+        password=os.getenv("DBPASS"),
+    )
+    await con.set_type_codec(
+        "json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+    )
+    try:
+        await seed(con, args.transactions, args.orders)
+        for name, reader in [("flat", flat), ("json_agg", nested)]:
+            samples, peak = await measure(con, reader, args.rounds)
+            print(
+                f"{name:>8}: median {statistics.median(samples):7.2f} ms"
+                f"  max {max(samples):7.2f} ms  peak mem {peak / 1024:8.1f} KiB"
+            )
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,739 @@
+"""End-to-end HTTP benchmark of main.app.
+
+Starts a throwaway Postgres cluster (initdb / pg_ctl from PATH, or from
+--pg-bin), loads bench/schema.sql, seeds it with a reproducible dataset and
+applies migrations/ on top. Then it starts bench.midtrans_stub and main.app
+under uvicorn and runs each scenario for --duration seconds with
+--concurrency virtual users:
+
+    feed      browse the feed three pages deep, open a post and its comments
+    likes     like storm on the ten newest posts
+    checkout  fill a cart and check it out against the stubbed Midtrans
+    admin     student, order, transaction, product and aspiration listings
+    writes    cart edits, comments and product updates
+
+Latency percentiles, requests/sec and database round trips per request (from
+the app's /metrics) are reported per route template and written as JSON,
+which --compare diffs against an earlier run. The run exits non-zero when a
+request failed or a route's mean round trips exceed ROUND_TRIP_BUDGET.
+
+    python -m bench.e2e [--scenarios feed,likes] [--duration 20] [--concurrency 20]
+    python -m bench.e2e --output after.json --compare before.json
+
+Pass --pg-host (and --pg-port/--pg-user/--pg-password) to use an existing
+server instead; a scratch database is created on it and dropped afterwards.
+"""
+import argparse
+import asyncio
+import datetime as dt
+import glob
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import asyncpg
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ["feed", "likes", "checkout", "admin", "writes"]
+
+# ceiling on each route's mean database statements per request; one more
+# than the route issues itself where a cold identity cache adds a lookup
+ROUND_TRIP_BUDGET = {
+    "GET /post": 1,
+    "GET /post/{post_id}": 1,
+    "GET /post/{post_id}/comment": 2,
+    "POST /post/{post_id}/like": 2,
+    "POST /post/{post_id}/comment": 1,
+    "GET /student/{nim}/cart": 2,
+    "POST /student/{nim}/cart": 3,
+    "PUT /student/{nim}/cart/{cart_id}": 2,
+    "DELETE /student/{nim}/cart/{cart_id}": 2,
+    "POST /student/{nim}/transactions": 3,
+    "GET /student/{nim}/transactions_all": 2,
+    "GET /student": 1,
+    "GET /order": 1,
+    "GET /product": 1,
+    "PUT /product/{product_id}": 1,
+    "GET /aspiration": 1,
+    "GET /academic_resource": 1,
+}
+
+ROUND_TRIPS = re.compile(
+    r'myhmtk_db_statements_per_request_(sum|count)'
+    r'\{method="([^"]+)",route="([^"]+)"\} (\S+)'
+)
+
+
+# database
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def postgres(args):
+    if args.pg_host:
+        server = dict(
+            host=args.pg_host,
+            port=args.pg_port,
+            user=args.pg_user,
+            password=args.pg_password,
+        )
+        name = f"myhmtk_bench_{os.getpid()}"
+        admin = await asyncpg.connect(database="postgres", **server)
+        await admin.execute(f"CREATE DATABASE {name}")
+        try:
+            yield dict(server, database=name)
+        finally:
+            await admin.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+            await admin.close()
+        return
+
+    def pg(name):
+        return os.path.join(args.pg_bin, name) if args.pg_bin else name
+
+    workdir = tempfile.mkdtemp(prefix="myhmtk-bench-pg-")
+    data = os.path.join(workdir, "data")
+    port = free_port()
+    try:
+        subprocess.run(
+            [pg("initdb"), "-D", data, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [
+                pg("pg_ctl"),
+                "-D", data,
+                "-l", os.path.join(workdir, "postgres.log"),
+                "-w",
+                "-o", (
+                    f"-p {port} -k {workdir} -c listen_addresses=127.0.0.1"
+                    " -c max_connections=200 -c fsync=off"
+                ),
+                "start",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield dict(
+                host="127.0.0.1", port=port, user="bench", password="", database="postgres"
+            )
+        finally:
+            subprocess.run(
+                [pg("pg_ctl"), "-D", data, "-m", "fast", "-w", "stop"],
+                stdout=subprocess.DEVNULL,
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# (query, names of the size parameters it takes as $1, $2, ...)
+SEED = [
+    (
+        """
+        INSERT INTO mahasiswa
+        SELECT 1301190000 + g, 'Mahasiswa ' || g, 628100000000 + g,
+            g || '@student.telkomuniversity.ac.id',
+            'https://cdn.example/avatar/' || g || '.png',
+            'Jl. Telekomunikasi No. ' || g || ', Bandung', md5(g::text)
+        FROM generate_series(1, $1::int) g
+        """,
+        ["students"],
+    ),
+    (
+        """
+        INSERT INTO admin (name, email, pass_hash)
+        SELECT 'Admin ' || g, 'admin' || g || '@hmtk.test', md5(g::text)
+        FROM generate_series(1, 10) g
+        """,
+        [],
+    ),
+    (
+        """
+        INSERT INTO product (name, price, description, img_url)
+        SELECT 'Merch ' || g, 25000 + 5000 * (g % 20), 'Official HMTK merch',
+            'https://cdn.example/product/' || g || '.png'
+        FROM generate_series(1, 30) g
+        """,
+        [],
+    ),
+    (
+        """
+        INSERT INTO post (poster_id, post_date, img_url, content, can_comment)
+        SELECT 1301190001 + floor(random() * $1::int)::int,
+            timestamp '2023-06-01' - random() * interval '90 days',
+            CASE WHEN random() < 0.3 THEN 'https://cdn.example/post/' || g || '.png' END,
+            repeat('Kabar himpunan hari ini. ', 1 + (random() * 8)::int),
+            random() < 0.9
+        FROM generate_series(1, $2::int) g
+        """,
+        ["students", "posts"],
+    ),
+    (
+        """
+        INSERT INTO "like" (post_id, liker_id)
+        SELECT DISTINCT
+            1 + floor(random() * $2::int)::int,
+            1301190001 + floor(random() * $1::int)::int
+        FROM generate_series(1, $2::int * 20)
+        """,
+        ["students", "posts"],
+    ),
+    (
+        """
+        INSERT INTO comment (post_id, commenter_id, comment_date, content)
+        SELECT
+            1 + floor(random() * $2::int)::int,
+            1301190001 + floor(random() * $1::int)::int,
+            timestamp '2023-06-01' - random() * interval '90 days', 'Mantap!'
+        FROM generate_series(1, $2::int * 5)
+        """,
+        ["students", "posts"],
+    ),
+    (
+        """
+        INSERT INTO transaction
+            (mahasiswa_nim, transaction_date, paid, completed, payment_url, status)
+        SELECT 1301190001 + floor(random() * $1::int)::int,
+            timestamp '2023-06-01' - random() * interval '180 days',
+            s IN ('settlement', 'capture'), s = 'settlement' AND random() < 0.5,
+            'https://app.sandbox.midtrans.com/snap/v2/vtweb/' || md5(g::text), s
+        FROM (
+            SELECT g, (ARRAY['settlement', 'capture', 'pending', 'expire', 'cancel'])
+                [1 + floor(random() * 5)::int] AS s
+            FROM generate_series(1, $2::int) g
+        ) t
+        """,
+        ["students", "transactions"],
+    ),
+    (
+        """
+        INSERT INTO "order"
+            (mahasiswa_nim, product_id, quantity, size, information, transaction_id)
+        SELECT t.mahasiswa_nim, 1 + floor(random() * 30)::int, 1 + floor(random() * 3)::int,
+            (ARRAY['s', 'm', 'l', 'xl'])[1 + floor(random() * 4)::int], NULL, t.id
+        FROM transaction t, generate_series(1, 3) n
+        WHERE n <= 1 + t.id % 3
+        """,
+        [],
+    ),
+    (
+        """
+        INSERT INTO aspiration (mahasiswa_nim, datetime, title, content)
+        SELECT 1301190001 + floor(random() * $1::int)::int,
+            timestamp '2023-06-01' - random() * interval '180 days',
+            'Aspirasi ' || g, 'Mohon fasilitas lab ditambah.'
+        FROM generate_series(1, 500) g
+        """,
+        ["students"],
+    ),
+    (
+        """
+        INSERT INTO academic_resource (admin_id, title, url)
+        SELECT 1 + g % 10, 'Modul ' || g, 'https://drive.example/' || g
+        FROM generate_series(1, 50) g
+        """,
+        [],
+    ),
+]
+
+
+async def seed(con, scale):
+    sizes = {
+        "students": 2000 * scale,
+        "posts": 5000 * scale,
+        "transactions": 20000 * scale,
+    }
+
+    with open(os.path.join(ROOT, "bench", "schema.sql")) as f:
+        await con.execute(f.read())
+
+    # random() is deterministic after setseed within one session, so every
+    # run at the same scale gets the same dataset
+    await con.execute("SELECT setseed(0.42)")
+    for query, params in SEED:
+        await con.execute(query, *(sizes[name] for name in params))
+
+    for path in sorted(glob.glob(os.path.join(ROOT, "migrations", "*.sql"))):
+        with open(path) as f:
+            await con.execute(f.read())
+    await con.execute("ANALYZE")
+
+    return {
+        "students": [1301190000 + n for n in range(1, sizes["students"] + 1)],
+        "hot_posts": [
+            row["id"]
+            for row in await con.fetch(
+                "SELECT id FROM post ORDER BY post_date DESC, id DESC LIMIT 10"
+            )
+        ],
+        "products": list(range(1, 31)),
+    }
+
+
+# processes
+
+
+def start_server(module, port, env, log):
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", module,
+            "--host", "127.0.0.1", "--port", str(port),
+            "--no-access-log", "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    return proc
+
+
+async def wait_ready(proc, url, log_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                break
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+
+    with open(log_path) as f:
+        tail = f.read()[-4000:]
+    raise RuntimeError(f"{url} did not come up:\n{tail}")
+
+
+def stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# scenarios
+
+
+class Recorder:
+    def __init__(self, client):
+        self.client = client
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, method, template, params=None, json=None, **path):
+        key = f"{method} {template}"
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(
+                method, template.format(**path), params=params, json=json
+            )
+        except httpx.HTTPError:
+            self.samples[key].append(time.perf_counter() - start)
+            self.errors[key] += 1
+            return None
+
+        self.samples[key].append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            self.errors[key] += 1
+            return None
+        return resp.json()
+
+
+async def feed(rec, user, data):
+    user_id = user.rng.choice(data["students"])
+    cursor = None
+    posts = []
+    for _ in range(3):
+        params = {"user_id": user_id, "limit": 20, "comment_preview": 3}
+        if cursor:
+            params["cursor"] = cursor
+        page = await rec.request("GET", "/post", params=params)
+        if not page:
+            return
+        posts += page["posts"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    if posts:
+        post_id = user.rng.choice(posts)["id"]
+        await rec.request(
+            "GET", "/post/{post_id}", params={"user_id": user_id}, post_id=post_id
+        )
+        await rec.request("GET", "/post/{post_id}/comment", post_id=post_id)
+
+
+async def likes(rec, user, data):
+    await rec.request(
+        "POST",
+        "/post/{post_id}/like",
+        params={"user_id": user.rng.choice(data["students"])},
+        post_id=user.rng.choice(data["hot_posts"]),
+    )
+
+
+async def checkout(rec, user, data):
+    # every virtual user shops as its own student, so carts never overlap
+    for _ in range(user.rng.randint(1, 3)):
+        await rec.request(
+            "POST",
+            "/student/{nim}/cart",
+            params={
+                "product_id": user.rng.choice(data["products"]),
+                "quantity": user.rng.randint(1, 3),
+                "size": user.rng.choice(["s", "m", "l", "xl"]),
+            },
+            nim=user.nim,
+        )
+
+    cart = await rec.request("GET", "/student/{nim}/cart", nim=user.nim)
+    if cart and cart["carts"]:
+        await rec.request(
+            "POST",
+            "/student/{nim}/transactions",
+            json=[item["id"] for item in cart["carts"]],
+            nim=user.nim,
+        )
+
+
+async def admin(rec, user, data):
+    nim = user.rng.choice(data["students"])
+    listing = user.rng.randrange(7)
+    if listing == 0:
+        await rec.request("GET", "/student")
+    elif listing == 1:
+        await rec.request("GET", "/order")
+    elif listing == 2:
+        await rec.request(
+            "GET",
+            "/student/{nim}/transactions_all",
+            params={"limit": 50, "include_total": "true"},
+            nim=nim,
+        )
+    elif listing == 3:
+        await rec.request(
+            "GET",
+            "/student/{nim}/transactions_all",
+            params={"limit": 50, "status": "settlement", "paid": "true"},
+            nim=nim,
+        )
+    elif listing == 4:
+        await rec.request("GET", "/product")
+    elif listing == 5:
+        await rec.request("GET", "/aspiration")
+    else:
+        await rec.request("GET", "/academic_resource")
+
+
+async def writes(rec, user, data):
+    await rec.request(
+        "POST",
+        "/student/{nim}/cart",
+        params={
+            "product_id": user.rng.choice(data["products"]),
+            "quantity": 1,
+            "size": "m",
+        },
+        nim=user.nim,
+    )
+    cart = await rec.request("GET", "/student/{nim}/cart", nim=user.nim)
+    if cart and cart["carts"]:
+        cart_id = cart["carts"][-1]["id"]
+        await rec.request(
+            "PUT",
+            "/student/{nim}/cart/{cart_id}",
+            params={"quantity": user.rng.randint(1, 3)},
+            nim=user.nim,
+            cart_id=cart_id,
+        )
+        await rec.request(
+            "DELETE", "/student/{nim}/cart/{cart_id}", nim=user.nim, cart_id=cart_id
+        )
+
+    await rec.request(
+        "POST",
+        "/post/{post_id}/comment",
+        params={
+            "commenter_id": user.nim,
+            "comment_date": dt.datetime.now().isoformat(),
+            "content": "bench comment",
+        },
+        post_id=user.rng.choice(data["hot_posts"]),
+    )
+    # no fields given, so the update leaves the row as it was
+    await rec.request(
+        "PUT", "/product/{product_id}", product_id=user.rng.choice(data["products"])
+    )
+
+
+class User:
+    __slots__ = ("rng", "nim")
+
+    def __init__(self, rng, nim):
+        self.rng = rng
+        self.nim = nim
+
+
+async def run_scenario(name, client, data, args):
+    scenario = globals()[name]
+    rec = Recorder(client)
+    deadline = time.perf_counter() + args.duration
+
+    async def virtual_user(i):
+        user = User(random.Random(args.seed * 1000 + i), data["students"][i])
+        while time.perf_counter() < deadline:
+            await scenario(rec, user, data)
+
+    before = await round_trips(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await round_trips(client)
+
+    routes = {
+        key: summarize(samples, rec.errors[key], elapsed)
+        for key, samples in sorted(rec.samples.items())
+    }
+    for key, route in routes.items():
+        total, count = after.get(key, (0, 0))
+        total -= before.get(key, (0, 0))[0]
+        count -= before.get(key, (0, 0))[1]
+        route["round_trips"] = total / count if count else None
+    total = sum(route["requests"] for route in routes.values())
+    return {"duration": elapsed, "requests": total, "rps": total / elapsed, "routes": routes}
+
+
+# results
+
+
+async def round_trips(client):
+    """(sum, count) of database round trips per route, read from /metrics."""
+    resp = await client.get("/metrics")
+    totals = defaultdict(lambda: [0.0, 0])
+    for match in ROUND_TRIPS.finditer(resp.text):
+        kind, method, route, value = match.groups()
+        if kind == "sum":
+            totals[f"{method} {route}"][0] = float(value)
+        else:
+            totals[f"{method} {route}"][1] = int(value)
+    return {key: tuple(value) for key, value in totals.items()}
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples, errors, elapsed):
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": len(ordered) / elapsed,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def report(name, result):
+    print(
+        f"\n{name}: {result['requests']} requests in {result['duration']:.1f}s"
+        f" ({result['rps']:.0f} req/s)"
+    )
+    print(
+        f"  {'route':<42} {'n':>7} {'err':>5} {'req/s':>8}"
+        f" {'p50':>8} {'p95':>8} {'p99':>8} {'db rt':>6}"
+    )
+    for key, route in result["routes"].items():
+        trips = route.get("round_trips")
+        print(
+            f"  {key:<42} {route['requests']:>7} {route['errors']:>5}"
+            f" {route['rps']:>8.1f} {route['p50_ms']:>8.2f}"
+            f" {route['p95_ms']:>8.2f} {route['p99_ms']:>8.2f}"
+            f" {'-' if trips is None else f'{trips:.2f}':>6}"
+        )
+
+
+def over_budget(results):
+    over = []
+    for name, result in results.items():
+        for key, route in result["routes"].items():
+            trips, budget = route.get("round_trips"), ROUND_TRIP_BUDGET.get(key)
+            if trips is not None and budget is not None and trips > budget:
+                over.append(f"{name}: {key} {trips:.2f} round trips, budget {budget}")
+    return over
+
+
+def compare(base, current):
+    print(f"\nvs {base['meta']['commit'][:10]} (p50 / p95 ms, req/s)")
+    for name, result in current["scenarios"].items():
+        before = base["scenarios"].get(name)
+        if before is None:
+            continue
+        print(f"  {name}")
+        for key, route in result["routes"].items():
+            old = before["routes"].get(key)
+            if old is None:
+                continue
+            print(
+                f"    {key:<40}"
+                f" {change(old['p50_ms'], route['p50_ms'])}"
+                f" {change(old['p95_ms'], route['p95_ms'])}"
+                f" {change(old['rps'], route['rps'])}"
+            )
+
+
+def change(old, new):
+    pct = (new - old) / old * 100 if old else 0
+    return f"{old:8.2f} -> {new:8.2f} ({pct:+5.1f}%)"
+
+
+def git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+# main
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--midtrans-latency-ms", type=float, default=100)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"))
+    parser.add_argument("--pg-host")
+    parser.add_argument("--pg-port", type=int, default=5432)
+    parser.add_argument("--pg-user", default="postgres")
+    parser.add_argument("--pg-password", default="")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit = git("rev-parse", "HEAD")
+    output = args.output or f"e2e-{commit[:10] or 'unknown'}.json"
+    secret = "bench-secret"
+    logdir = tempfile.mkdtemp(prefix="myhmtk-bench-")
+
+    async with postgres(args) as database:
+        con = await asyncpg.connect(**database)
+        try:
+            print(f"seeding scale {args.scale} ...")
+            data = await seed(con, args.scale)
+        finally:
+            await con.close()
+
+        stub_port, app_port = free_port(), free_port()
+        env = dict(
+            os.environ,
+            DBHOST=database["host"],
+            PGPORT=str(database["port"]),
+            DBNAME=database["database"],
+            DBUSER=database["user"],
+            DBPASS=database["password"],
+            SECRET_KEY=secret,
+            MIDTRANS_SERVER_KEY="bench",
+            MIDTRANS_SNAP_URL=f"http://127.0.0.1:{stub_port}/snap/v1/transactions",
+            STUB_LATENCY_MS=str(args.midtrans_latency_ms),
+            SMTP_HOST="127.0.0.1",
+            SMTP_PORT=str(free_port()),
+        )
+
+        stub_log = os.path.join(logdir, "midtrans_stub.log")
+        app_log = os.path.join(logdir, "app.log")
+        with open(stub_log, "w") as stub_out, open(app_log, "w") as app_out:
+            stub = start_server("bench.midtrans_stub:app", stub_port, env, stub_out)
+            app = start_server("main:app", app_port, env, app_out)
+            try:
+                await wait_ready(stub, f"http://127.0.0.1:{stub_port}/stats", stub_log)
+                await wait_ready(app, f"http://127.0.0.1:{app_port}/openapi.json", app_log)
+
+                results = {}
+                async with httpx.AsyncClient(
+                    base_url=f"http://127.0.0.1:{app_port}",
+                    headers={"Authorization": f"Bearer {secret}"},
+                    limits=httpx.Limits(max_connections=args.concurrency),
+                    timeout=60,
+                ) as client:
+                    for name in scenarios:
+                        results[name] = await run_scenario(name, client, data, args)
+                        report(name, results[name])
+            finally:
+                stop(app)
+                stop(stub)
+
+    current = {
+        "meta": {
+            "commit": commit,
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "args": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "compare", "pg_password")
+            },
+        },
+        "scenarios": results,
+    }
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    errors = sum(
+        route["errors"]
+        for result in results.values()
+        for route in result["routes"].values()
+    )
+    if errors:
+        print(f"{errors} requests failed, server logs kept in {logdir}")
+    else:
+        shutil.rmtree(logdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), current)
+
+    over = over_budget(results)
+    for line in over:
+        print(f"over round trip budget: {line}")
+    if errors or over:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Local stand-in for the Midtrans Snap API.
+
+    STUB_LATENCY_MS=300 STUB_FAILURE_RATE=0.05 uvicorn bench.midtrans_stub:app --port 8001
+    MIDTRANS_SNAP_URL=http://127.0.0.1:8001/snap/v1/transactions uvicorn main:app
+
+STUB_LATENCY_MS is the simulated round trip, STUB_FAILURE_RATE the share of
+requests answered with 503. GET /stats reports request counts and the peak
+number of requests in flight, POST /stats/reset clears them.
+"""
+import asyncio
+import os
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", 300)) / 1000
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", 0))
+
+app = FastAPI()
+stats = {"requests": 0, "failures": 0, "in_flight": 0, "peak_in_flight": 0}
+order_ids = set()
+
+
+@app.post("/snap/v1/transactions")
+async def create_transaction(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(LATENCY)
+
+        if random.random() < FAILURE_RATE:
+            stats["failures"] += 1
+            return JSONResponse(
+                status_code=503, content={"error_messages": ["stub failure"]}
+            )
+
+        order_id = payload["transaction_details"]["order_id"]
+        if order_id in order_ids:
+            return JSONResponse(
+                status_code=406,
+                content={"error_messages": ["transaction_details.order_id sudah digunakan"]},
+            )
+        order_ids.add(order_id)
+
+        token = str(uuid.uuid4())
+        return JSONResponse(
+            status_code=201,
+            content={
+                "token": token,
+                "redirect_url": f"http://127.0.0.1/snap/v2/vtweb/{token}",
+            },
+        )
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    stats.update(requests=0, failures=0, peak_in_flight=0)
+    order_ids.clear()
+    return stats
@@ -0,0 +1,128 @@
+-- Base tables for the disposable benchmark database, as they stand before
+-- migrations/; bench/e2e.py loads this, seeds it, then applies migrations/
+-- in order on top.
+
+CREATE TABLE mahasiswa (
+    nim bigint PRIMARY KEY,
+    name text NOT NULL,
+    tel bigint NOT NULL,
+    email text NOT NULL UNIQUE,
+    avatar_url text NOT NULL,
+    address text NOT NULL,
+    pass_hash text NOT NULL
+);
+
+CREATE TABLE admin (
+    id serial PRIMARY KEY,
+    name text NOT NULL,
+    email text NOT NULL UNIQUE,
+    pass_hash text NOT NULL
+);
+
+CREATE TABLE tokens (
+    mahasiswa_nim bigint NOT NULL REFERENCES mahasiswa (nim) ON DELETE CASCADE,
+    exp timestamp NOT NULL,
+    token text NOT NULL
+);
+
+CREATE TABLE post (
+    id serial PRIMARY KEY,
+    poster_id bigint NOT NULL REFERENCES mahasiswa (nim),
+    post_date timestamp NOT NULL,
+    img_url text,
+    content text NOT NULL,
+    can_comment boolean NOT NULL
+);
+
+CREATE TABLE "like" (
+    post_id integer NOT NULL REFERENCES post (id) ON DELETE CASCADE,
+    liker_id bigint NOT NULL REFERENCES mahasiswa (nim)
+);
+
+CREATE TABLE comment (
+    id serial PRIMARY KEY,
+    post_id integer NOT NULL REFERENCES post (id) ON DELETE CASCADE,
+    commenter_id bigint NOT NULL REFERENCES mahasiswa (nim) ON DELETE CASCADE,
+    comment_date timestamp NOT NULL,
+    content text NOT NULL
+);
+
+CREATE TABLE lab_post (
+    id serial PRIMARY KEY,
+    post_date timestamp NOT NULL,
+    lab text NOT NULL,
+    content text NOT NULL,
+    img_url text
+);
+
+CREATE TABLE fun_tk (
+    id serial PRIMARY KEY,
+    post_date timestamp NOT NULL,
+    title text NOT NULL,
+    description text NOT NULL,
+    img_url text NOT NULL,
+    date date NOT NULL,
+    time time NOT NULL,
+    location text NOT NULL,
+    map_url text
+);
+
+CREATE TABLE academic_resource (
+    id serial PRIMARY KEY,
+    admin_id integer NOT NULL REFERENCES admin (id),
+    title text NOT NULL,
+    url text NOT NULL
+);
+
+CREATE TABLE activity (
+    id serial PRIMARY KEY,
+    post_date timestamp NOT NULL,
+    title text NOT NULL,
+    content text NOT NULL,
+    img_url text NOT NULL
+);
+
+CREATE TABLE aspiration (
+    id serial PRIMARY KEY,
+    mahasiswa_nim bigint NOT NULL REFERENCES mahasiswa (nim) ON DELETE CASCADE,
+    datetime timestamp NOT NULL,
+    title text NOT NULL,
+    content text NOT NULL
+);
+
+CREATE TABLE product (
+    id serial PRIMARY KEY,
+    name text NOT NULL,
+    price integer NOT NULL,
+    description text NOT NULL,
+    img_url text NOT NULL
+);
+
+CREATE TABLE cart (
+    id serial PRIMARY KEY,
+    mahasiswa_nim bigint NOT NULL REFERENCES mahasiswa (nim) ON DELETE CASCADE,
+    product_id integer NOT NULL REFERENCES product (id),
+    quantity integer NOT NULL,
+    size text NOT NULL,
+    information text
+);
+
+CREATE TABLE transaction (
+    id serial PRIMARY KEY,
+    mahasiswa_nim bigint NOT NULL REFERENCES mahasiswa (nim),
+    transaction_date timestamp NOT NULL,
+    paid boolean NOT NULL DEFAULT false,
+    completed boolean NOT NULL DEFAULT false,
+    payment_url text,
+    status text NOT NULL
+);
+
+CREATE TABLE "order" (
+    id serial PRIMARY KEY,
+    mahasiswa_nim bigint NOT NULL REFERENCES mahasiswa (nim),
+    product_id integer NOT NULL REFERENCES product (id),
+    quantity integer NOT NULL,
+    size text NOT NULL,
+    information text,
+    transaction_id integer REFERENCES transaction (id) ON DELETE CASCADE
+);
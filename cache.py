@@ -0,0 +1,361 @@
+import os
+import time
+import asyncio
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from util import db
+import queries
+
+
+class SortedIds(array):
+    def __new__(cls, ids=()):
+        return super().__new__(cls, "q", ids)
+
+    def __contains__(self, id):
+        i = bisect_left(self, id)
+        return i < len(self) and self[i] == id
+
+    def add(self, id):
+        i = bisect_left(self, id)
+        if i == len(self) or self[i] != id:
+            self.insert(i, id)
+
+    def discard(self, id):
+        i = bisect_left(self, id)
+        if i < len(self) and self[i] == id:
+            del self[i]
+
+
+class LikedPostCache:
+    """Liked post ids per user, kept as sorted int64 arrays with LRU eviction.
+
+    Toggles on this worker update the cached ids in place; toggles served by
+    another worker only show up once the user's entry is older than ``ttl``.
+    """
+
+    def __init__(self, max_users, ttl):
+        self.max_users = max_users
+        self.ttl = ttl
+        # user id -> (liked ids, expires at)
+        self._users = OrderedDict()
+        # users with a load in flight, and the ones whose load went stale
+        # because a like was toggled while it ran
+        self._loading = {}
+        self._stale = set()
+
+    async def get(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is not None:
+            liked, expires = entry
+            if time.monotonic() < expires:
+                self._users.move_to_end(user_id)
+                return liked
+            del self._users[user_id]
+
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        try:
+            rows = await db.pool.fetch(
+                'SELECT post_id FROM "like" WHERE liker_id = $1 ORDER BY post_id',
+                user_id,
+            )
+        finally:
+            self._loading[user_id] -= 1
+            stale = user_id in self._stale
+            if not self._loading[user_id]:
+                del self._loading[user_id]
+                self._stale.discard(user_id)
+
+        liked = SortedIds(row["post_id"] for row in rows)
+        if not stale:
+            self._users[user_id] = (liked, time.monotonic() + self.ttl)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+        return liked
+
+    def set_liked(self, user_id, post_id, liked):
+        if user_id in self._loading:
+            self._stale.add(user_id)
+
+        entry = self._users.get(user_id)
+        if entry is None:
+            return
+        ids = entry[0]
+        if liked:
+            ids.add(post_id)
+        else:
+            ids.discard(post_id)
+
+    def forget(self, user_id):
+        if user_id in self._loading:
+            self._stale.add(user_id)
+        self._users.pop(user_id, None)
+
+
+class _Entry:
+    __slots__ = ("value", "tags", "fresh_until", "stale_until")
+
+    def __init__(self, value, tags, fresh_until, stale_until):
+        self.value = value
+        self.tags = tags
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    """Size-bounded TTL cache with stale-while-revalidate and tag invalidation.
+
+    ``load`` is an async callable returning ``(value, tags)``; a ``None``
+    value is handed back to the caller but never cached.
+    """
+
+    def __init__(self, max_entries, ttl, stale_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._loading = {}
+
+        # loads that finish after one of their tags was invalidated must not
+        # be stored, so remember when each tag was last invalidated while
+        # loads are in flight
+        self._seq = 0
+        self._invalidated = {}
+        self._inflight = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, key, load):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.fresh_until:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._loading:
+                    self._start_load(key, load)
+                return entry.value
+
+        self.misses += 1
+        task = self._loading.get(key) or self._start_load(key, load)
+        return await asyncio.shield(task)
+
+    def invalidate(self, *tags):
+        self._seq += 1
+        for tag in tags:
+            if self._inflight:
+                self._invalidated[tag] = self._seq
+            for key in self._tags.pop(tag, ()):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _start_load(self, key, load):
+        task = asyncio.ensure_future(self._load(key, load))
+        self._loading[key] = task
+        task.add_done_callback(lambda task: self._load_done(key, task))
+        return task
+
+    def _load_done(self, key, task):
+        self._loading.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"cache load for {key} failed: {task.exception()!r}")
+
+    async def _load(self, key, load):
+        started = self._seq
+        self._inflight += 1
+        try:
+            value, tags = await load()
+        finally:
+            self._inflight -= 1
+
+        stale = any(self._invalidated.get(tag, 0) > started for tag in tags)
+        if not self._inflight:
+            self._invalidated.clear()
+
+        if value is not None and not stale:
+            self._store(key, value, tags)
+        return value
+
+    def _store(self, key, value, tags):
+        self._remove(key)
+
+        now = time.monotonic()
+        self._entries[key] = _Entry(
+            value, tags, now + self.ttl, now + self.ttl + self.stale_ttl
+        )
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+
+class IdentityCache:
+    """Rows looked up by primary key, LRU-bounded.
+
+    Found rows are kept for ``ttl`` and misses for ``negative_ttl``, so
+    probes for ids that do not exist still reach the database now and then.
+    Writers call ``invalidate`` for the keys they add, change or delete;
+    other workers only notice once ``ttl`` ran out, so inserts that trust a
+    cached row map foreign key violations through ``missing_reference``.
+    """
+
+    def __init__(self, load, max_entries, ttl, negative_ttl):
+        self.load = load
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        # key -> (row or None, expires at)
+        self._entries = OrderedDict()
+        self._loading = {}
+        # keys invalidated while their load was in flight
+        self._stale = set()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            row, expires = entry
+            if time.monotonic() < expires:
+                self._entries.move_to_end(key)
+                if row is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return row
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._loading[key] = task
+            task.add_done_callback(lambda task: self._load_done(key, task))
+        return await asyncio.shield(task)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            if key in self._loading:
+                self._stale.add(key)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _load_done(self, key, task):
+        self._loading.pop(key, None)
+        self._stale.discard(key)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"identity cache load for {key} failed: {task.exception()!r}")
+
+    async def _load(self, key):
+        row = await self.load(key)
+        if key in self._stale:
+            return row
+
+        ttl = self.ttl if row is not None else self.negative_ttl
+        self._entries[key] = (row, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return row
+
+
+liked_posts = LikedPostCache(
+    max_users=int(os.getenv("LIKED_POSTS_CACHE_USERS", 10000)),
+    ttl=float(os.getenv("LIKED_POSTS_CACHE_TTL", 5)),
+)
+
+post_cache = ResponseCache(
+    max_entries=int(os.getenv("POST_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("POST_CACHE_TTL", 5)),
+    stale_ttl=float(os.getenv("POST_CACHE_STALE_TTL", 30)),
+)
+
+student_cache = IdentityCache(
+    lambda nim: queries.fetchrow("student_by_nim", nim),
+    max_entries=int(os.getenv("STUDENT_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("IDENTITY_CACHE_TTL", 5)),
+    negative_ttl=float(os.getenv("IDENTITY_CACHE_NEGATIVE_TTL", 5)),
+)
+
+product_cache = IdentityCache(
+    lambda product_id: queries.fetchrow("product_by_id", product_id),
+    max_entries=int(os.getenv("PRODUCT_CACHE_SIZE", 1000)),
+    ttl=float(os.getenv("IDENTITY_CACHE_TTL", 5)),
+    negative_ttl=float(os.getenv("IDENTITY_CACHE_NEGATIVE_TTL", 5)),
+)
+
+
+async def missing_reference(nim=None, product_id=None):
+    """The 404 for an insert whose student or product foreign key failed.
+
+    The row was cached as existing but has been deleted since, usually
+    through another worker; both entries are dropped and looked up again to
+    name the one that is gone.
+    """
+    if nim is not None:
+        student_cache.invalidate(nim)
+        if not await student_cache.get(nim):
+            return HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
+    if product_id is not None:
+        product_cache.invalidate(product_id)
+        if not await product_cache.get(product_id):
+            return HTTPException(
+                404, f"Product dengan id {product_id} tidak ditemukan"
+            )
+    return HTTPException(409, "Data berubah saat diproses, silakan coba lagi")
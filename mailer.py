@@ -0,0 +1,168 @@
+import asyncio
+import os
+import smtplib
+import time
+
+from dotenv import load_dotenv
+
+from metrics import smtp_batch_duration
+
+load_dotenv()
+
+
+class EmailOutbox:
+    """In-process email queue drained by workers that keep their SMTP
+    connection open between batches."""
+
+    def __init__(
+        self,
+        host="localhost",
+        port=25,
+        workers=2,
+        batch_size=20,
+        max_attempts=5,
+        backoff=2.0,
+        idle_timeout=30.0,
+        timeout=10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self.sent = 0
+        self.failed = 0
+
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._retries = {}
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def close(self, drain_timeout=10.0):
+        # emails waiting out a retry backoff get their next attempt now
+        # instead of being dropped along with their timer
+        for handle, email in self._retries.values():
+            handle.cancel()
+            self._queue.put_nowait(email)
+        self._retries = {}
+
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # whatever failed again or did not get its turn is dropped
+        unsent = []
+        for handle, email in self._retries.values():
+            handle.cancel()
+            unsent.append(email)
+        self._retries = {}
+        while not self._queue.empty():
+            unsent.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for email in unsent:
+            print(f"Error: email to {email['receivers']} dropped at shutdown")
+        if unsent:
+            print(f"email outbox closed with {len(unsent)} unsent emails")
+
+    def enqueue(self, sender, receivers, message):
+        self._queue.put_nowait(
+            {"sender": sender, "receivers": receivers, "message": message, "attempts": 0}
+        )
+
+    async def _worker(self):
+        smtp = None
+        try:
+            while True:
+                try:
+                    email = await asyncio.wait_for(self._queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if smtp is not None:
+                        await asyncio.to_thread(self._quit, smtp)
+                        smtp = None
+                    continue
+
+                batch = [email]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                start = time.perf_counter()
+                try:
+                    smtp, failed = await asyncio.to_thread(self._send_batch, smtp, batch)
+                except Exception as e:
+                    print(f"Error: unable to connect to smtp server: {e}")
+                    smtp, failed = None, [(email, e) for email in batch]
+                smtp_batch_duration.labels().observe(time.perf_counter() - start)
+
+                self.sent += len(batch) - len(failed)
+                for email, error in failed:
+                    self._retry(email, error)
+                for _ in batch:
+                    self._queue.task_done()
+        finally:
+            if smtp is not None:
+                await asyncio.to_thread(self._quit, smtp)
+
+    def _send_batch(self, smtp, batch):
+        # runs in a worker thread, smtplib is blocking
+        if smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+        failed = []
+        for email in batch:
+            try:
+                smtp.sendmail(email["sender"], email["receivers"], email["message"])
+            except smtplib.SMTPServerDisconnected:
+                try:
+                    smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                    smtp.sendmail(email["sender"], email["receivers"], email["message"])
+                except Exception as e:
+                    failed.append((email, e))
+            except Exception as e:
+                failed.append((email, e))
+
+        return smtp, failed
+
+    def _retry(self, email, error):
+        email["attempts"] += 1
+        if email["attempts"] >= self.max_attempts:
+            self.failed += 1
+            print(f"Error: unable to send email to {email['receivers']}: {error}")
+            return
+
+        delay = self.backoff * 2 ** (email["attempts"] - 1)
+        handle = asyncio.get_running_loop().call_later(delay, self._requeue, email)
+        self._retries[id(email)] = (handle, email)
+
+    def _requeue(self, email):
+        self._retries.pop(id(email), None)
+        self._queue.put_nowait(email)
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+outbox = EmailOutbox(
+    host=os.getenv("SMTP_HOST", "localhost"),
+    port=int(os.getenv("SMTP_PORT", 25)),
+    workers=int(os.getenv("EMAIL_WORKERS", 2)),
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", 20)),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", 5)),
+)
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
 from routes.route_auth import auth_router
@@ -17,12 +17,21 @@ from routes.route_product import product_router
 from routes.reset_password import reset_pw_router
 from routes.route_midtrans import midtrans_router
 from routes.route_activity import activity_router
+from routes.route_internal import internal_router
 
-from util import bearer_scheme, MyHMTKMiddleware, db
+from util import bearer_scheme, MyHMTKMiddleware, FastRoute, FastJSONResponse, db
+from metrics import MetricsMiddleware, render as render_metrics
+from tracing import QueryTraceMiddleware
+from midtrans import snap
+from mailer import outbox
+from tasks import transaction_sweeper
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+app.router.route_class = FastRoute
 
-app.add_middleware(MyHMTKMiddleware, fastapi_app=app)
+app.add_middleware(MyHMTKMiddleware)
+app.add_middleware(QueryTraceMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,10 +46,16 @@ app.state.tokens = []
 @app.on_event("startup")
 async def startup():
     await db.create_pool()
+    await snap.start()
+    await outbox.start()
+    await transaction_sweeper.start()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await transaction_sweeper.close()
+    await outbox.close()
+    await snap.close()
     await db.pool.close()
 
 
@@ -49,6 +64,11 @@ async def root():
     return RedirectResponse("/docs")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(auth_router, dependencies=[Depends(bearer_scheme)])
 app.include_router(admin_router, dependencies=[Depends(bearer_scheme)])
 app.include_router(student_router, dependencies=[Depends(bearer_scheme)])
@@ -62,6 +82,7 @@ app.include_router(product_router, dependencies=[Depends(bearer_scheme)])
 app.include_router(cart_router, dependencies=[Depends(bearer_scheme)])
 app.include_router(transaction_router, dependencies=[Depends(bearer_scheme)])
 app.include_router(order_router, dependencies=[Depends(bearer_scheme)])
+app.include_router(internal_router, dependencies=[Depends(bearer_scheme)])
 
 app.include_router(midtrans_router)
 app.include_router(reset_pw_router)
@@ -0,0 +1,219 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+
+# seconds; fine at the low end where a healthy pool or query lives
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram; a value lands in the first bucket it is <= to."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # one extra slot for values above the last bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, count in zip(self.buckets, self.counts):
+            total += count
+            yield le, total
+
+    def stats(self):
+        return {
+            "buckets": [{"le": le, "count": count} for le, count in self.cumulative()],
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _Family:
+    """A named metric with one child per combination of label values."""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def _child(self):
+        return Value()
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.type}")
+        for values, child in self._children.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {child.value}")
+
+
+class Counter(_Family):
+    type = "counter"
+
+
+class Gauge(_Family):
+    type = "gauge"
+
+
+class LabeledHistogram(_Family):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def _child(self):
+        return Histogram(self.buckets)
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.type}")
+        for values, child in self._children.items():
+            for le, count in child.cumulative():
+                labels = _labels(self.labelnames + ("le",), values + (repr(le),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _labels(self.labelnames + ("le",), values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {child.count}")
+            labels = _labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = []
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for family in REGISTRY:
+        family.render(lines)
+    lines.append("")
+    return "\n".join(lines)
+
+
+# per-request time spent waiting on dependencies, filled in by the database
+# pool and the Midtrans client while MetricsMiddleware handles the request
+request_timings = ContextVar("request_timings", default=None)
+
+
+def add_time(dependency, seconds):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[dependency] = timings.get(dependency, 0.0) + seconds
+
+
+requests_total = Counter(
+    "myhmtk_http_requests_total",
+    "HTTP requests by route template and status code.",
+    ("method", "route", "status"),
+)
+request_duration = LabeledHistogram(
+    "myhmtk_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route"),
+)
+requests_in_flight = Gauge(
+    "myhmtk_http_requests_in_flight",
+    "HTTP requests currently being handled, by route template.",
+    ("method", "route"),
+)
+dependency_duration = LabeledHistogram(
+    "myhmtk_http_request_dependency_seconds",
+    "Time a request spent in a dependency (db, midtrans), for requests that used it.",
+    ("method", "route", "dependency"),
+)
+smtp_batch_duration = LabeledHistogram(
+    "myhmtk_smtp_batch_seconds",
+    "Time the email outbox spent delivering one batch over SMTP.",
+)
+
+
+class MetricsMiddleware:
+    """Records count, latency, status and dependency time per route template.
+
+    The template comes from the route FastAPI matched (``scope["route"]``),
+    so ``/post/1`` and ``/post/2`` share ``/post/{post_id}``; requests that
+    never reached an API route (404s, auth rejections, docs) are grouped
+    under ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        timings = {}
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_timings.reset(token)
+
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            requests_total.labels(method, template, str(status)).inc()
+            request_duration.labels(method, template).observe(elapsed)
+            for dependency, seconds in timings.items():
+                dependency_duration.labels(method, template, dependency).observe(
+                    seconds
+                )
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import add_time
+
+load_dotenv()
+
+
+SANDBOX_SNAP_URL = "https://app.sandbox.midtrans.com/snap/v1/transactions"
+
+# statuses where Midtrans turned the request away before creating anything;
+# a 500 or a gateway 502/504 may come back after the order_id was created,
+# and retrying those would fail on the duplicate order_id
+RETRY_STATUS = {429, 503}
+
+
+class SnapError(Exception):
+    pass
+
+
+class SnapClient:
+    """Async Midtrans Snap client on a pooled, keep-alive httpx connection."""
+
+    def __init__(
+        self,
+        server_key,
+        url=SANDBOX_SNAP_URL,
+        connect_timeout=5.0,
+        read_timeout=15.0,
+        max_connections=20,
+        max_concurrency=20,
+        retries=2,
+        backoff=0.2,
+    ):
+        self.server_key = server_key
+        self.url = url
+        self.timeout = httpx.Timeout(
+            read_timeout, connect=connect_timeout, pool=connect_timeout
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            auth=(self.server_key or "", ""),
+            headers={"Accept": "application/json"},
+            timeout=self.timeout,
+            limits=self.limits,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def create_transaction_redirect_url(self, payload):
+        return (await self.create_transaction(payload))["redirect_url"]
+
+    async def create_transaction(self, payload):
+        start = time.perf_counter()
+        try:
+            return await self._create_transaction(payload)
+        finally:
+            add_time("midtrans", time.perf_counter() - start)
+
+    async def _create_transaction(self, payload):
+        if self._client is None:
+            await self.start()
+
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+                # only failures where Midtrans cannot have created the
+                # transaction are retried, a read timeout is not
+                try:
+                    resp = await self._client.post(self.url, json=payload)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    error = SnapError(f"{type(e).__name__}: {e}")
+                    continue
+                except httpx.HTTPError as e:
+                    raise SnapError(f"{type(e).__name__}: {e}") from e
+
+                if resp.status_code in RETRY_STATUS:
+                    error = SnapError(f"HTTP {resp.status_code}: {resp.text}")
+                    continue
+
+                try:
+                    data = resp.json()
+                except ValueError:
+                    raise SnapError(f"HTTP {resp.status_code}: {resp.text}")
+
+                if not isinstance(data, dict):
+                    raise SnapError(f"HTTP {resp.status_code}: {data!r}")
+                if resp.status_code >= 400 or "redirect_url" not in data:
+                    raise SnapError(
+                        f"HTTP {resp.status_code}: {data.get('error_messages', data)}"
+                    )
+                return data
+
+        raise error
+
+
+snap = SnapClient(
+    server_key=os.getenv("MIDTRANS_SERVER_KEY"),
+    url=os.getenv("MIDTRANS_SNAP_URL", SANDBOX_SNAP_URL),
+    connect_timeout=float(os.getenv("MIDTRANS_CONNECT_TIMEOUT", 5)),
+    read_timeout=float(os.getenv("MIDTRANS_READ_TIMEOUT", 15)),
+    max_connections=int(os.getenv("MIDTRANS_MAX_CONNECTIONS", 20)),
+    max_concurrency=int(os.getenv("MIDTRANS_MAX_CONCURRENCY", 20)),
+    retries=int(os.getenv("MIDTRANS_RETRIES", 2)),
+)
@@ -0,0 +1,5 @@
+-- keyset pagination for GET /post walks post in (post_date, id) order
+CREATE INDEX IF NOT EXISTS post_post_date_id_idx ON post (post_date DESC, id DESC);
+
+-- per-post like counts and is_liked lookups
+CREATE INDEX IF NOT EXISTS like_post_id_idx ON "like" (post_id);
@@ -0,0 +1,12 @@
+-- denormalized like counter, kept in sync by POST /post/{post_id}/like and
+-- rebuildable from "like" with POST /internal/post/like_count
+ALTER TABLE post ADD COLUMN IF NOT EXISTS like_count integer NOT NULL DEFAULT 0;
+
+UPDATE post SET like_count = counted.like_count
+FROM (
+    SELECT p.id, COUNT(l.post_id) AS like_count
+    FROM post p
+    LEFT JOIN "like" l ON l.post_id = p.id
+    GROUP BY p.id
+) counted
+WHERE post.id = counted.id;
@@ -0,0 +1,16 @@
+-- POST /post/{post_id}/like inserts with ON CONFLICT (post_id, liker_id),
+-- which needs a unique index; drop duplicate likes before creating it
+DELETE FROM "like" a
+USING "like" b
+WHERE a.ctid < b.ctid AND a.post_id = b.post_id AND a.liker_id = b.liker_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS like_post_id_liker_id_key ON "like" (post_id, liker_id);
+
+UPDATE post SET like_count = counted.like_count
+FROM (
+    SELECT p.id, COUNT(l.post_id) AS like_count
+    FROM post p
+    LEFT JOIN "like" l ON l.post_id = p.id
+    GROUP BY p.id
+) counted
+WHERE post.id = counted.id AND post.like_count <> counted.like_count;
@@ -0,0 +1,3 @@
+-- comment pages, per-post comment counts and latest-comment previews
+CREATE INDEX IF NOT EXISTS comment_post_id_comment_date_id_idx
+    ON comment (post_id, comment_date, id);
@@ -0,0 +1,3 @@
+-- background sweeper expiring pending transactions (tasks.TransactionSweeper)
+CREATE INDEX IF NOT EXISTS transaction_status_transaction_date_idx
+    ON transaction (status, transaction_date);
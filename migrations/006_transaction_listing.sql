@@ -0,0 +1,8 @@
+-- admin transaction listing: keyset pages over (transaction_date, id), with
+-- or without a student filter
+CREATE INDEX IF NOT EXISTS transaction_transaction_date_id_idx
+    ON transaction (transaction_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS transaction_mahasiswa_nim_transaction_date_idx
+    ON transaction (mahasiswa_nim, transaction_date DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS order_transaction_id_idx ON "order" (transaction_id);
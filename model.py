@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional, Literal, Union
 import datetime as dt
+import functools
 
 
 class Response(BaseModel):
@@ -79,6 +80,28 @@ class GetAllAspirationResponse(BaseModel):
     aspirations: List[Aspiration]
 
 
+# Comment
+class Comment(BaseModel):
+    id: int
+    post_id: int
+    commenter: Student
+    comment_date: dt.datetime
+    content: str
+
+
+class GetAllCommentResponse(BaseModel):
+    success: bool
+    message: str
+    comments: List[Comment]
+    next_cursor: Optional[str]
+
+
+class GetCommentResponse(BaseModel):
+    success: bool
+    message: str
+    comment: Optional[Comment]
+
+
 # Post
 class Post(BaseModel):
     id: int
@@ -89,12 +112,15 @@ class Post(BaseModel):
     current_like_count: int
     can_comment: bool
     is_liked: Optional[bool]
+    comment_count: int
+    latest_comments: Optional[List[Comment]]
 
 
 class GetAllPostResponse(BaseModel):
     success: bool
     message: str
     posts: List[Post]
+    next_cursor: Optional[str]
 
 
 class GetPostResponse(BaseModel):
@@ -103,6 +129,13 @@ class GetPostResponse(BaseModel):
     post: Optional[Post]
 
 
+class ToggleLikeResponse(BaseModel):
+    success: bool
+    message: str
+    is_liked: Optional[bool]
+    current_like_count: Optional[int]
+
+
 # Lab Post
 class LabPost(BaseModel):
     id: int
@@ -169,27 +202,6 @@ class GetAcademicResourceResponse(BaseModel):
     academic_resource: Optional[AcademicResource]
 
 
-# Comment
-class Comment(BaseModel):
-    id: int
-    post_id: int
-    commenter: Student
-    comment_date: dt.datetime
-    content: str
-
-
-class GetAllCommentResponse(BaseModel):
-    success: bool
-    message: str
-    comments: List[Comment]
-
-
-class GetCommentResponse(BaseModel):
-    success: bool
-    message: str
-    comment: Optional[Comment]
-
-
 # Activity
 class Activity(BaseModel):
     id: int
@@ -254,6 +266,26 @@ class GetStudentCartResponse(BaseModel):
     cart: Optional[Cart]
 
 
+class CartOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    cart_id: Optional[int]  # update, remove
+    product_id: Optional[int]  # add
+    quantity: Optional[int]
+    size: Optional[Literal["xs", "s", "m", "l", "xl", "xxl"]]
+    information: Optional[str]
+
+
+class CartLine(Cart):
+    line_total: int
+
+
+class BulkStudentCartResponse(BaseModel):
+    success: bool
+    message: str
+    carts: List[CartLine]
+    grand_total: int
+
+
 # Order
 class Order(BaseModel):
     id: int
@@ -292,6 +324,8 @@ class GetAllTransactionResponse(BaseModel):
     success: bool
     message: str
     transactions: List[Transaction]
+    next_cursor: Optional[str]
+    total: Optional[int]
 
 class StudentTransaction(BaseModel):
     id: int
@@ -319,3 +353,121 @@ class AddTransactionResponse(BaseModel):
     success: bool
     message: str
     payment_url: Optional[str]
+
+
+# Internal
+class CacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    stale_hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class IdentityCacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    negative_hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class GetCacheStatsResponse(BaseModel):
+    success: bool
+    message: str
+    post_cache: CacheStats
+    student_cache: IdentityCacheStats
+    product_cache: IdentityCacheStats
+
+
+class QueryStats(BaseModel):
+    name: str
+    executions: int
+    total_ms: float
+
+
+class GetQueryStatsResponse(BaseModel):
+    success: bool
+    message: str
+    statements: List[QueryStats]
+
+
+class HistogramBucket(BaseModel):
+    le: float
+    count: int
+
+
+class HistogramStats(BaseModel):
+    buckets: List[HistogramBucket]
+    sum: float
+    count: int
+
+
+class PoolStats(BaseModel):
+    min_size: int
+    max_size: int
+    size: int
+    in_use: int
+    idle: int
+    waiting: int
+    connections_opened: int
+    connections_closed: int
+    acquire_wait: HistogramStats
+
+
+class GetPoolStatsResponse(BaseModel):
+    success: bool
+    message: str
+    pool: PoolStats
+
+
+# Hydration
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _column_map(model, prefix, columns):
+    columns = dict(columns)
+    return tuple(
+        (name, columns.get(name, prefix + name), field)
+        for name, field in model.__fields__.items()
+    )
+
+
+def hydrate(model, record, prefix="", columns=None, **values):
+    """Build ``model`` from a database row without validating it.
+
+    Each field is read from the column ``prefix + field`` unless ``columns``
+    maps it to another one; keyword ``values`` (nested models, mostly) win
+    over columns, and optional fields with no column take their default; a
+    required field with no column raises ``KeyError``, so a query that drifted
+    from its model fails instead of serving rows that break its schema. Only
+    for trusted rows whose columns already have the declared types.
+    """
+    column_map = _column_map(
+        model, prefix, tuple(columns.items()) if columns else ()
+    )
+
+    data = {}
+    for name, column, field in column_map:
+        if name in values:
+            data[name] = values[name]
+        else:
+            value = record.get(column, _MISSING)
+            if value is _MISSING:
+                if field.required:
+                    raise KeyError(
+                        f"{model.__name__}.{name} needs column {column!r}"
+                    )
+                value = field.get_default()
+            data[name] = value
+
+    # what BaseModel.construct does, minus its per-call field bookkeeping
+    obj = model.__new__(model)
+    object.__setattr__(obj, "__dict__", data)
+    object.__setattr__(obj, "__fields_set__", set(data))
+    return obj
@@ -0,0 +1,484 @@
+import time
+
+from util import db
+
+
+# hot statements, executed by name through fetch / fetchrow / fetchval below;
+# each connection prepares them on first use into asyncpg's statement cache,
+# like any other query string
+STATEMENTS = {
+    "student_by_nim": "SELECT * FROM mahasiswa WHERE nim = $1",
+    "product_by_id": "SELECT * FROM product WHERE id = $1",
+    "post_feed_page": """
+        SELECT
+            post.id,
+            post.poster_id,
+            post.post_date,
+            post.img_url,
+            post.content,
+            post.can_comment,
+            mahasiswa.name AS mahasiswa_name,
+            mahasiswa.tel AS mahasiswa_tel,
+            mahasiswa.email AS mahasiswa_email,
+            mahasiswa.avatar_url AS mahasiswa_avatar_url,
+            mahasiswa.address AS mahasiswa_address,
+            mahasiswa.pass_hash AS mahasiswa_pass_hash,
+            post.like_count AS current_like_count,
+            (
+                SELECT COUNT(*) FROM comment WHERE comment.post_id = post.id
+            ) AS comment_count,
+            CASE WHEN $4 > 0 THEN COALESCE(
+                (
+                    SELECT json_agg(latest ORDER BY latest.comment_date, latest.id)
+                    FROM (
+                        SELECT
+                            cm.id,
+                            cm.post_id,
+                            cm.comment_date,
+                            cm.content,
+                            json_build_object(
+                                'nim', m.nim,
+                                'name', m.name,
+                                'tel', m.tel,
+                                'email', m.email,
+                                'avatar_url', m.avatar_url,
+                                'address', m.address,
+                                'pass_hash', m.pass_hash
+                            ) AS commenter
+                        FROM comment cm
+                        LEFT JOIN mahasiswa m ON cm.commenter_id = m.nim
+                        WHERE cm.post_id = post.id
+                        ORDER BY cm.comment_date DESC, cm.id DESC
+                        LIMIT $4
+                    ) latest
+                ),
+                '[]'
+            ) END AS latest_comments
+        FROM post
+        LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
+        WHERE (post.post_date, post.id) < ($1, $2)
+        ORDER BY post.post_date DESC, post.id DESC
+        LIMIT $3
+    """,
+    "post_by_id": """
+        SELECT
+            post.id,
+            post.poster_id,
+            post.post_date,
+            post.img_url,
+            post.content,
+            post.can_comment,
+            mahasiswa.name AS mahasiswa_name,
+            mahasiswa.tel AS mahasiswa_tel,
+            mahasiswa.email AS mahasiswa_email,
+            mahasiswa.avatar_url AS mahasiswa_avatar_url,
+            mahasiswa.address AS mahasiswa_address,
+            mahasiswa.pass_hash AS mahasiswa_pass_hash,
+            post.like_count AS current_like_count,
+            (
+                SELECT COUNT(*) FROM comment WHERE comment.post_id = post.id
+            ) AS comment_count,
+            CASE WHEN $2 > 0 THEN COALESCE(
+                (
+                    SELECT json_agg(latest ORDER BY latest.comment_date, latest.id)
+                    FROM (
+                        SELECT
+                            cm.id,
+                            cm.post_id,
+                            cm.comment_date,
+                            cm.content,
+                            json_build_object(
+                                'nim', m.nim,
+                                'name', m.name,
+                                'tel', m.tel,
+                                'email', m.email,
+                                'avatar_url', m.avatar_url,
+                                'address', m.address,
+                                'pass_hash', m.pass_hash
+                            ) AS commenter
+                        FROM comment cm
+                        LEFT JOIN mahasiswa m ON cm.commenter_id = m.nim
+                        WHERE cm.post_id = post.id
+                        ORDER BY cm.comment_date DESC, cm.id DESC
+                        LIMIT $2
+                    ) latest
+                ),
+                '[]'
+            ) END AS latest_comments
+        FROM post
+        LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
+        WHERE post.id = $1
+    """,
+    # serializes toggles of one (post_id, liker_id) pair; it has to run as its
+    # own statement before post_like_toggle, whose snapshot would otherwise
+    # predate a concurrent toggle's insert
+    "post_like_lock": """
+        SELECT pg_advisory_xact_lock(
+            hashtextextended(format('like:%s:%s', $1::int, $2::bigint), 0)
+        )
+    """,
+    "post_like_toggle": """
+        WITH target AS (
+            SELECT post.id AS post_id, mahasiswa.nim AS liker_id
+            FROM post, mahasiswa
+            WHERE post.id = $1 AND mahasiswa.nim = $2
+        ),
+        removed AS (
+            DELETE FROM "like"
+            USING target
+            WHERE "like".post_id = target.post_id AND "like".liker_id = target.liker_id
+            RETURNING "like".post_id
+        ),
+        added AS (
+            INSERT INTO "like" (post_id, liker_id)
+            SELECT post_id, liker_id FROM target
+            WHERE NOT EXISTS (SELECT 1 FROM removed)
+            ON CONFLICT (post_id, liker_id) DO NOTHING
+            RETURNING post_id
+        ),
+        counted AS (
+            UPDATE post
+            SET like_count = like_count
+                + (SELECT COUNT(*) FROM added)
+                - (SELECT COUNT(*) FROM removed)
+            WHERE id IN (SELECT post_id FROM target)
+            RETURNING like_count
+        )
+        SELECT
+            EXISTS (SELECT 1 FROM post WHERE id = $1) AS post_exists,
+            EXISTS (SELECT 1 FROM mahasiswa WHERE nim = $2) AS user_exists,
+            EXISTS (SELECT 1 FROM added) AS is_liked,
+            (SELECT like_count FROM counted) AS like_count
+    """,
+    "post_comments_page": """
+        SELECT
+            cm.id,
+            cm.comment_date,
+            cm.content,
+            cm.post_id,
+            m.nim AS student_nim,
+            m.name AS student_name,
+            m.tel AS student_tel,
+            m.email AS student_email,
+            m.avatar_url AS student_avatar_url,
+            m.address AS student_address,
+            m.pass_hash AS student_pass_hash
+        FROM comment cm
+        LEFT JOIN mahasiswa m
+        ON cm.commenter_id = m.nim
+        WHERE cm.post_id = $1 AND (cm.comment_date, cm.id) > ($2, $3)
+        ORDER BY cm.comment_date, cm.id
+        LIMIT $4
+    """,
+    "student_carts": """
+        SELECT
+            c.id AS cart_id,
+            c.quantity,
+            c.size,
+            c.information,
+            c.mahasiswa_nim,
+            p.id AS product_id,
+            p.name AS product_name,
+            p.price AS product_price,
+            p.description as product_desc,
+            p.img_url as product_img_url,
+            p.price * c.quantity AS line_total
+        FROM cart c
+        LEFT JOIN product p ON
+            c.product_id = p.id
+        WHERE mahasiswa_nim = $1
+    """,
+    "student_cart": """
+        SELECT
+            c.id AS cart_id,
+            c.quantity,
+            c.size,
+            c.information,
+            c.mahasiswa_nim,
+            p.id AS product_id,
+            p.name AS product_name,
+            p.price AS product_price,
+            p.description as product_desc,
+            p.img_url as product_img_url
+        FROM cart c
+        LEFT JOIN product p ON
+            c.product_id = p.id
+        WHERE mahasiswa_nim = $1 AND c.id = $2
+    """,
+    # checkout as one statement: take the student's carts out (row locks make
+    # a concurrent checkout of the same carts find nothing), open a pending
+    # transaction and turn the carts into its orders; all or nothing, so no
+    # rows and no changes unless every cart exists and belongs to the student
+    "checkout_prepare": """
+        WITH found AS (
+            SELECT c.id
+            FROM cart c
+            JOIN product p ON p.id = c.product_id
+            WHERE c.id = ANY($3) AND c.mahasiswa_nim = $1
+            FOR UPDATE OF c
+        ),
+        carts AS (
+            DELETE FROM cart c
+            USING product p
+            WHERE
+                c.id IN (SELECT id FROM found)
+                AND p.id = c.product_id
+                AND (SELECT COUNT(*) FROM found)
+                    = (SELECT COUNT(DISTINCT id) FROM unnest($3::int[]) id)
+            RETURNING
+                c.id AS cart_id,
+                c.product_id,
+                c.quantity,
+                c.size,
+                c.information,
+                p.name,
+                p.img_url,
+                p.price
+        ),
+        new_transaction AS (
+            INSERT INTO transaction (
+                mahasiswa_nim, transaction_date, paid, completed, status)
+            SELECT $1, $2, false, false, 'pending'
+            WHERE EXISTS (SELECT 1 FROM carts)
+            RETURNING id
+        ),
+        orders AS (
+            INSERT INTO "order" (
+                mahasiswa_nim, product_id, quantity, size, information, transaction_id)
+            SELECT
+                $1, carts.product_id, carts.quantity, carts.size, carts.information,
+                new_transaction.id
+            FROM carts, new_transaction
+        )
+        SELECT new_transaction.id AS transaction_id, carts.*
+        FROM new_transaction, carts
+    """,
+    # undo checkout_prepare when Midtrans refused the payment: the orders and
+    # the transaction are dropped and the carts checkout_prepare returned go
+    # back under their old ids, so the client's cart ids stay valid; nothing
+    # is put back if the transaction is already gone
+    "checkout_cancel": """
+        WITH orders AS (
+            DELETE FROM "order" WHERE transaction_id = $1
+        ),
+        removed AS (
+            DELETE FROM transaction WHERE id = $1
+            RETURNING id
+        )
+        INSERT INTO cart (id, mahasiswa_nim, product_id, quantity, size, information)
+        SELECT c.id, $2, c.product_id, c.quantity, c.size, c.information
+        FROM unnest($3::int[], $4::int[], $5::int[], $6::text[], $7::text[])
+            AS c (id, product_id, quantity, size, information)
+        WHERE EXISTS (SELECT 1 FROM removed)
+    """,
+    # until then the transaction is half done: the listings below skip rows
+    # with no payment_url, and tasks.TransactionSweeper puts the orders of
+    # ones left behind (a worker that died mid checkout) back into the cart
+    "checkout_finish": "UPDATE transaction SET payment_url = $1 WHERE id = $2",
+    "transactions_page": """
+        WITH page AS (
+            SELECT
+                t.id,
+                t.mahasiswa_nim,
+                t.transaction_date,
+                t.paid,
+                t.completed,
+                t.payment_url,
+                CASE
+                    WHEN t.status = 'pending' AND t.transaction_date <= $1 THEN 'expire'
+                    ELSE t.status
+                END AS status
+            FROM transaction t
+            WHERE
+                ($2::text IS NULL OR CASE
+                    WHEN t.status = 'pending' AND t.transaction_date <= $1 THEN 'expire'
+                    ELSE t.status
+                END = $2)
+                AND ($3::boolean IS NULL OR t.paid = $3)
+                AND ($4::boolean IS NULL OR t.completed = $4)
+                AND ($5::timestamp IS NULL OR t.transaction_date >= $5)
+                AND ($6::timestamp IS NULL OR t.transaction_date < $6)
+                AND ($7::bigint IS NULL OR t.mahasiswa_nim = $7)
+                AND EXISTS (SELECT 1 FROM "order" WHERE transaction_id = t.id)
+                AND t.payment_url IS NOT NULL
+                AND (t.transaction_date, t.id) < ($8, $9)
+            ORDER BY t.transaction_date DESC, t.id DESC
+            LIMIT $10
+        )
+        SELECT
+            t.id,
+            t.transaction_date,
+            t.paid,
+            t.completed,
+            t.payment_url,
+            t.status,
+            m.nim AS mahasiswa_nim,
+            m.name AS mahasiswa_name,
+            m.tel AS mahasiswa_tel,
+            m.email AS mahasiswa_email,
+            m.address AS mahasiswa_address,
+            m.avatar_url AS mahasiswa_avatar_url,
+            m.pass_hash AS mahasiswa_pass_hash,
+            COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', o.id,
+                            'product', json_build_object(
+                                'id', p.id,
+                                'name', p.name,
+                                'price', p.price,
+                                'description', p.description,
+                                'img_url', p.img_url
+                            ),
+                            'quantity', o.quantity,
+                            'size', o.size,
+                            'information', o.information
+                        )
+                        ORDER BY o.id
+                    )
+                    FROM "order" o
+                    JOIN product p ON o.product_id = p.id
+                    WHERE o.transaction_id = t.id
+                ),
+                '[]'
+            ) AS orders
+        FROM
+            page t
+            JOIN mahasiswa m ON t.mahasiswa_nim = m.nim
+        ORDER BY t.transaction_date DESC, t.id DESC
+    """,
+    "transactions_count": """
+        SELECT COUNT(*)
+        FROM transaction t
+        WHERE
+            ($2::text IS NULL OR CASE
+                WHEN t.status = 'pending' AND t.transaction_date <= $1 THEN 'expire'
+                ELSE t.status
+            END = $2)
+            AND ($3::boolean IS NULL OR t.paid = $3)
+            AND ($4::boolean IS NULL OR t.completed = $4)
+            AND ($5::timestamp IS NULL OR t.transaction_date >= $5)
+            AND ($6::timestamp IS NULL OR t.transaction_date < $6)
+            AND ($7::bigint IS NULL OR t.mahasiswa_nim = $7)
+            AND EXISTS (SELECT 1 FROM "order" WHERE transaction_id = t.id)
+            AND t.payment_url IS NOT NULL
+    """,
+    "student_transactions": """
+        SELECT
+            t.id,
+            t.transaction_date,
+            t.paid,
+            t.completed,
+            t.payment_url,
+            CASE
+                WHEN t.status = 'pending' AND t.transaction_date <= $2 THEN 'expire'
+                ELSE t.status
+            END AS status,
+            COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', o.id,
+                            'product', json_build_object(
+                                'id', p.id,
+                                'name', p.name,
+                                'price', p.price,
+                                'description', p.description,
+                                'img_url', p.img_url
+                            ),
+                            'quantity', o.quantity,
+                            'size', o.size,
+                            'information', o.information
+                        )
+                        ORDER BY o.id
+                    )
+                    FROM "order" o
+                    JOIN product p ON o.product_id = p.id
+                    WHERE o.transaction_id = t.id
+                ),
+                '[]'
+            ) AS orders
+        FROM transaction t
+        WHERE
+            t.mahasiswa_nim = $1
+            AND EXISTS (SELECT 1 FROM "order" WHERE transaction_id = t.id)
+            AND t.payment_url IS NOT NULL
+        ORDER BY t.transaction_date DESC
+    """,
+    "student_transaction": """
+        SELECT
+            t.id,
+            t.transaction_date,
+            t.paid,
+            t.completed,
+            t.payment_url,
+            CASE
+                WHEN t.status = 'pending' AND t.transaction_date <= $2 THEN 'expire'
+                ELSE t.status
+            END AS status,
+            COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', o.id,
+                            'product', json_build_object(
+                                'id', p.id,
+                                'name', p.name,
+                                'price', p.price,
+                                'description', p.description,
+                                'img_url', p.img_url
+                            ),
+                            'quantity', o.quantity,
+                            'size', o.size,
+                            'information', o.information
+                        )
+                        ORDER BY o.id
+                    )
+                    FROM "order" o
+                    JOIN product p ON o.product_id = p.id
+                    WHERE o.transaction_id = t.id
+                ),
+                '[]'
+            ) AS orders
+        FROM transaction t
+        WHERE
+            t.id = $1
+            AND EXISTS (SELECT 1 FROM "order" WHERE transaction_id = t.id)
+            AND t.payment_url IS NOT NULL
+    """,
+}
+
+# name -> [executions, total seconds]
+stats = {name: [0, 0.0] for name in STATEMENTS}
+
+
+async def _run(method, name, args, con):
+    start = time.perf_counter()
+    try:
+        if con is not None:
+            return await getattr(con, method)(STATEMENTS[name], *args)
+        async with db.pool.acquire() as con:
+            return await getattr(con, method)(STATEMENTS[name], *args)
+    finally:
+        entry = stats[name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+
+
+# con: run on this connection (e.g. a request's LazyConnection) instead of
+# checking one out of the pool
+async def fetch(name, *args, con=None):
+    return await _run("fetch", name, args, con)
+
+
+async def fetchrow(name, *args, con=None):
+    return await _run("fetchrow", name, args, con)
+
+
+async def fetchval(name, *args, con=None):
+    return await _run("fetchval", name, args, con)
+
+
+async def execute(name, *args, con=None):
+    return await _run("execute", name, args, con)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Depends, Request, Form
 from fastapi.templating import Jinja2Templates
 
-from util import db, hash_str
+from util import db, hash_str, FastRoute, LazyConnection, db_connection
+from cache import post_cache, student_cache
 
 import datetime as dt
 import pytz
 
-reset_pw_router = APIRouter(prefix="/reset_password", include_in_schema=False)
+reset_pw_router = APIRouter(
+    prefix="/reset_password", include_in_schema=False, route_class=FastRoute
+)
 templates = Jinja2Templates("./templates")
 
 
@@ -37,8 +40,13 @@ async def reset_pw_page(request: Request, token: str):
 
 
 @reset_pw_router.post("")
-async def reset_pw_page(request: Request, token: str, password: str = Form(...)):
-    token_data = await db.pool.fetchrow(
+async def reset_pw_page(
+    request: Request,
+    token: str,
+    password: str = Form(...),
+    con: LazyConnection = Depends(db_connection(transaction=True)),
+):
+    token_data = await con.fetchrow(
         "SELECT * FROM tokens LEFT JOIN mahasiswa ON tokens.mahasiswa_nim = mahasiswa.nim WHERE token = $1",
         token,
     )
@@ -46,11 +54,11 @@ async def reset_pw_page(request: Request, token: str, password: str = Form(...))
     if not token_data:
         status = "Token is Invalid"
     elif token_data["exp"] < dt.datetime.now(pytz.timezone("Asia/Jakarta")).replace(tzinfo=None):
-        await db.pool.execute("DELETE FROM tokens WHERE token = $1", token)
+        await con.execute("DELETE FROM tokens WHERE token = $1", token)
 
         status = "Token is Expired"
     else:
-        await db.pool.execute(
+        await con.execute(
             "DELETE FROM tokens WHERE token = $1 OR mahasiswa_nim = $2",
             token,
             token_data["nim"],
@@ -58,11 +66,15 @@ async def reset_pw_page(request: Request, token: str, password: str = Form(...))
         status = "Password changed"
         pass_hash = hash_str(password)
 
-        await db.pool.execute(
+        await con.execute(
             "UPDATE mahasiswa SET pass_hash = $1 WHERE nim = $2",
             pass_hash,
             token_data["nim"],
         )
+        await con.release()
+        student_cache.invalidate(token_data["nim"])
+        # cached posts embed the poster's and commenters' pass_hash
+        post_cache.invalidate(f"student:{token_data['nim']}")
 
     return templates.TemplateResponse(
         "reset_pw.html", {"request": request, "status": status, "data": None}, 303
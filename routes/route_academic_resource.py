@@ -3,17 +3,18 @@ from asyncpg.exceptions import ForeignKeyViolationError
 
 from typing import Optional
 
-from util import db
+from util import db, FastRoute
 from model import (
     Response,
     Admin,
     AcademicResource,
     GetAllAcademicResourceResponse,
     GetAcademicResourceResponse,
+    hydrate,
 )
 
 academic_resource_router = APIRouter(
-    prefix="/academic_resource", tags=["Academic Resource"]
+    prefix="/academic_resource", tags=["Academic Resource"], route_class=FastRoute
 )
 
 
@@ -38,23 +39,14 @@ async def get_all_academic_resource():
         """
     )
 
-    academic_resources = []
-    for academic_resource in academic_resources_db:
-        admin = Admin(
-            id=academic_resource["admin_id"],
-            name=academic_resource["admin_name"],
-            email=academic_resource["admin_email"],
-            pass_hash=academic_resource["admin_pass_hash"],
-        )
-
-        academic_resources.append(
-            AcademicResource(
-                id=academic_resource["id"],
-                admin=admin,
-                title=academic_resource["title"],
-                url=academic_resource["url"],
-            )
+    academic_resources = [
+        hydrate(
+            AcademicResource,
+            academic_resource,
+            admin=hydrate(Admin, academic_resource, prefix="admin_"),
         )
+        for academic_resource in academic_resources_db
+    ]
 
     return GetAllAcademicResourceResponse(
         success=True,
@@ -136,22 +128,18 @@ async def add_academic_resource(admin_id: int, title: str, url: str):
 async def update_academic_resource(
     admin_id: int, title: Optional[str] = None, url: Optional[str] = None
 ):
-    academic_resorce = await db.pool.fetchrow(
-        "SELECT * FROM academic_resource WHERE id = $1", admin_id
+    updated = await db.pool.fetchval(
+        "UPDATE academic_resource SET title = COALESCE($1, title), url = COALESCE($2, url) WHERE id = $3 RETURNING id",
+        title,
+        url,
+        admin_id,
     )
-    if not academic_resorce:
+    if updated is None:
         return Response(
             success=False,
             message=f"Academic resource dengan id {admin_id} tidak ditemukan",
         )
 
-    await db.pool.execute(
-        "UPDATE academic_resource SET title = COALESCE($1, title), url = COALESCE($2, url) WHERE id = $3",
-        title,
-        url,
-        admin_id,
-    )
-
     return Response(
         success=True, message=f"Berhasil menyunting academic resource {admin_id}"
     )
@@ -159,17 +147,15 @@ async def update_academic_resource(
 
 @academic_resource_router.delete("{admin_id}", response_model=Response)
 async def delete_academic_resource(admin_id: int):
-    academic_resource = await db.pool.fetchrow(
-        "SELECT * FROM academic_resource WHERE id = $1", admin_id
+    deleted = await db.pool.fetchval(
+        "DELETE FROM academic_resource WHERE id = $1 RETURNING id", admin_id
     )
-    if not academic_resource:
+    if deleted is None:
         return Response(
             success=False,
             message=f"Academic resource dengan id {admin_id} tidak ditemukan",
         )
 
-    await db.pool.execute("DELETE FROM academic_resource WHERE id = $1", admin_id)
-
     return Response(
         success=True, message=f"Berhasil menghapus academic resource {admin_id}"
     )
@@ -4,10 +4,12 @@ from asyncpg.exceptions import ForeignKeyViolationError
 from typing import Optional
 import datetime as dt
 
-from util import db
+from util import db, FastRoute
 from model import Response, Activity, GetAllActivitiesResponse, GetActivityResponse
 
-activity_router = APIRouter(prefix="/activity", tags=["Activity"])
+activity_router = APIRouter(
+    prefix="/activity", tags=["Activity"], route_class=FastRoute
+)
 
 
 @activity_router.get("", response_model=GetAllActivitiesResponse)
@@ -76,11 +78,7 @@ async def update_activity(
     content: Optional[str] = None,
     img_url: Optional[str] = None,
 ):
-    activity = await db.pool.fetchrow("SELECT * FROM activity WHERE id = $1", activity_id)
-    if not activity:
-        raise HTTPException(404, f"Activity dengan id {activity_id} tidak ditemukan")
-
-    await db.pool.execute(
+    updated = await db.pool.fetchval(
         """
         UPDATE activity 
         SET 
@@ -88,22 +86,25 @@ async def update_activity(
             title = COALESCE($2, title), 
             content = COALESCE($3, content) 
         WHERE id = $4
+        RETURNING id
         """,
         img_url,
         title,
         content,
         activity_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Activity dengan id {activity_id} tidak ditemukan")
 
     return Response(success=True, message=f"Berhasil menyunting activity {activity_id}")
 
 
 @activity_router.delete("/{activity_id}", response_model=Response)
 async def delete_activity(activity_id: int):
-    activity = await db.pool.fetchrow("SELECT * FROM activity WHERE id = $1", activity_id)
-    if not activity:
+    deleted = await db.pool.fetchval(
+        "DELETE FROM activity WHERE id = $1 RETURNING id", activity_id
+    )
+    if deleted is None:
         raise HTTPException(404, f"Activity dengan id {activity_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM activity WHERE id = $1", activity_id)
-
     return Response(success=True, message=f"Berhasil menghapus activity {activity_id}")
@@ -2,10 +2,10 @@ from fastapi import APIRouter, HTTPException
 
 from typing import Optional
 
-from util import db, hash_str
+from util import db, hash_str, FastRoute
 from model import Response, GetAllAdminResponse, GetAdminResponse
 
-admin_router = APIRouter(prefix="/admin", tags=["Admin"])
+admin_router = APIRouter(prefix="/admin", tags=["Admin"], route_class=FastRoute)
 
 
 @admin_router.get("", response_model=GetAllAdminResponse)
@@ -56,27 +56,25 @@ async def update_admin(
     else:
         pass_hash = None
     
-    admin = await db.pool.fetchrow("SELECT * FROM admin WHERE id = $1", admin_id)
-    if not admin:
-        raise HTTPException(404, f"Admin dengan id {admin_id} tidak ditemukan")
-
-    await db.pool.execute(
-        "UPDATE admin SET name = COALESCE($1, name), email = COALESCE($2, email), pass_hash = COALESCE($3, pass_hash) WHERE id = $4",
+    updated = await db.pool.fetchval(
+        "UPDATE admin SET name = COALESCE($1, name), email = COALESCE($2, email), pass_hash = COALESCE($3, pass_hash) WHERE id = $4 RETURNING id",
         name,
         email,
         pass_hash,
         admin_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Admin dengan id {admin_id} tidak ditemukan")
 
     return Response(success=True, message=f"Berhasil menyunting admin {admin_id}")
 
 
 @admin_router.delete("/{admin_id}", response_model=Response)
 async def delete_admin(admin_id: int):
-    admin = await db.pool.fetchrow("SELECT * FROM admin WHERE id = $1", admin_id)
-    if not admin:
+    deleted = await db.pool.fetchval(
+        "DELETE FROM admin WHERE id = $1 RETURNING id", admin_id
+    )
+    if deleted is None:
         raise HTTPException(404, f"Admin dengan id {admin_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM admin WHERE id = $1", admin_id)
-
     return Response(success=True, message=f"Berhasil menghapus admin {admin_id}")
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Request, HTTPException
 
 from model import Student, Admin, Auth, AuthResponse, Response
-from util import db, hash_str, send_email
+from util import db, hash_str, send_email, FastRoute
 
 import datetime as dt
 import secrets
 import pytz
 
 
-auth_router = APIRouter(prefix="/auth", tags=["Auth"])
+auth_router = APIRouter(prefix="/auth", tags=["Auth"], route_class=FastRoute)
 
 
 # @auth_router.get("")
@@ -56,8 +56,6 @@ async def reset_password(request: Request, email: str):
         raise HTTPException(404, f"Mahasiswa dengan email {email} tidak ditemukan")
 
     token = secrets.token_urlsafe(32)
-    send_email(email, student["name"], token)
-
     exp = dt.datetime.now(pytz.timezone("Asia/Jakarta")).replace(tzinfo=None) + dt.timedelta(hours=1)
 
     await db.pool.execute(
@@ -67,4 +65,7 @@ async def reset_password(request: Request, email: str):
         token,
     )
 
+    # only queued here, the outbox workers deliver it in the background
+    send_email(email, student["name"], token)
+
     return Response(success=True, message="Email reset password terkirim")
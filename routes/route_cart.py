@@ -1,63 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+import asyncpg
 
 from model import (
     Response,
     Cart,
+    CartLine,
+    CartOperation,
     Product,
     GetStudentCartResponse,
     GetAllStudentCartResponse,
+    BulkStudentCartResponse,
 )
-from util import db
-from typing import Literal, Optional
+from util import db, FastRoute, LazyConnection, db_connection
+import queries
+from cache import student_cache, product_cache, missing_reference
+from typing import List, Literal, Optional
 
-cart_router = APIRouter(prefix="/student", tags=["Cart"])
+cart_router = APIRouter(prefix="/student", tags=["Cart"], route_class=FastRoute)
 
 
 @cart_router.get("/{nim}/cart", response_model=GetAllStudentCartResponse)
 async def get_all_student_carts(nim: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    carts_db = await db.pool.fetch(
-        """
-        SELECT 
-            c.id AS cart_id,
-            c.quantity,
-            c.size,
-            c.information,
-            c.mahasiswa_nim,
-            p.id AS product_id,
-            p.name AS product_name, 
-            p.price AS product_price,
-            p.description as product_desc,
-            p.img_url as product_img_url
-        FROM cart c
-        LEFT JOIN product p ON
-            c.product_id = p.id       
-        WHERE mahasiswa_nim = $1
-    """,
-        nim,
-    )
+    carts_db = await queries.fetch("student_carts", nim)
 
-    carts = []
-    for cart in carts_db:
-        product = Product(
-            id=cart["product_id"],
-            name=cart["product_name"],
-            price=cart["product_price"],
-            description=cart["product_desc"],
-            img_url=cart["product_img_url"],
-        )
-        carts.append(
-            Cart(
-                id=cart["cart_id"],
-                product=product,
-                quantity=cart["quantity"],
-                size=cart["size"],
-                information=cart["information"],
-            )
-        )
+    carts = [_cart_from_row(cart) for cart in carts_db]
 
     return GetAllStudentCartResponse(
         success=True,
@@ -66,29 +36,27 @@ async def get_all_student_carts(nim: int):
     )
 
 
+def _cart_from_row(cart, model=Cart, **fields):
+    product = Product(
+        id=cart["product_id"],
+        name=cart["product_name"],
+        price=cart["product_price"],
+        description=cart["product_desc"],
+        img_url=cart["product_img_url"],
+    )
+    return model(
+        id=cart["cart_id"],
+        product=product,
+        quantity=cart["quantity"],
+        size=cart["size"],
+        information=cart["information"],
+        **fields,
+    )
+
+
 @cart_router.get("/{nim}/cart/{cart_id}", response_model=GetStudentCartResponse)
 async def get_student_cart(nim: int, cart_id: int):
-    cart_db = await db.pool.fetchrow(
-        """
-        SELECT 
-            c.id AS cart_id,
-            c.quantity,
-            c.size,
-            c.information,
-            c.mahasiswa_nim,
-            p.id AS product_id,
-            p.name AS product_name, 
-            p.price AS product_price,
-            p.description as product_desc,
-            p.img_url as product_img_url
-        FROM cart c
-        LEFT JOIN product p ON
-            c.product_id = p.id
-        WHERE mahasiswa_nim = $1 AND c.id = $2
-        """,
-        nim,
-        cart_id,
-    )
+    cart_db = await queries.fetchrow("student_cart", nim, cart_id)
 
     if not cart_db:
         return HTTPException(
@@ -125,27 +93,30 @@ async def add_student_cart(
     size: Literal["xs", "s", "m", "l", "xl", "xxl"],
     information: str = None,
 ):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    product = await db.pool.fetchrow("SELECT * FROM product WHERE id = $1", product_id)
+    product = await product_cache.get(product_id)
     if not product:
         raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
 
-    await db.pool.execute(
-        """
-        INSERT INTO cart 
-            (mahasiswa_nim, product_id, quantity, size, information)
-        VALUES
-            ($1, $2, $3, $4, $5)
-        """,
-        nim,
-        product_id,
-        quantity,
-        size,
-        information,
-    )
+    try:
+        await db.pool.execute(
+            """
+            INSERT INTO cart 
+                (mahasiswa_nim, product_id, quantity, size, information)
+            VALUES
+                ($1, $2, $3, $4, $5)
+            """,
+            nim,
+            product_id,
+            quantity,
+            size,
+            information,
+        )
+    except asyncpg.ForeignKeyViolationError:
+        raise await missing_reference(nim=nim, product_id=product_id)
 
     return Response(success=True, message="Berhasil menambahkan cart baru")
 
@@ -158,41 +129,152 @@ async def update_student_cart(
     size: Optional[Literal["xs", "s", "m", "l", "xl", "xxl"]] = None,
     information: Optional[str] = None,
 ):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    cart = await db.pool.fetchrow("SELECT * FROM cart WHERE id = $1", cart_id)
-    if not cart:
-        raise HTTPException(404, f"Cart dengan id {cart_id} tidak ditemukan")
-
-    await db.pool.execute(
+    updated = await db.pool.fetchval(
         """
         UPDATE cart SET
             quantity = COALESCE($1, quantity),
             size = COALESCE($2, size),
             information = COALESCE($3, information)
         WHERE id = $4
+        RETURNING id
         """,
         quantity,
         size,
         information,
         cart_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Cart dengan id {cart_id} tidak ditemukan")
 
     return Response(success=True, message=f"Berhasil menyunting cart {cart_id}")
 
 
 @cart_router.delete("/{nim}/cart/{cart_id}", response_model=Response)
 async def delete_student_cart(nim: int, cart_id: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    cart = await db.pool.fetchrow("SELECT * FROM cart WHERE id = $1", cart_id)
-    if not cart:
+    deleted = await db.pool.fetchval(
+        "DELETE FROM cart WHERE id = $1 RETURNING id", cart_id
+    )
+    if deleted is None:
         raise HTTPException(404, f"Cart dengan id {cart_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM cart WHERE id = $1", cart_id)
-
     return Response(success=True, message=f"Berhasil menghapus cart {cart_id}")
+
+
+@cart_router.post("/{nim}/cart/bulk", response_model=BulkStudentCartResponse)
+async def bulk_student_cart(
+    nim: int,
+    operations: List[CartOperation],
+    con: LazyConnection = Depends(db_connection(transaction=True)),
+):
+    student = await student_cache.get(nim)
+    if not student:
+        raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
+
+    # operations are grouped by kind so each kind is one unnest statement:
+    # updates of the same cart collapse with later fields winning, and
+    # updates run before removes
+    adds = []
+    updates = {}
+    removes = {}
+    for operation in operations:
+        if operation.op == "add":
+            if None in (operation.product_id, operation.quantity, operation.size):
+                raise HTTPException(
+                    400, "Operasi add membutuhkan product_id, quantity dan size"
+                )
+            adds.append(operation)
+        elif operation.cart_id is None:
+            raise HTTPException(400, f"Operasi {operation.op} membutuhkan cart_id")
+        elif operation.op == "update":
+            updates.setdefault(operation.cart_id, {}).update(
+                operation.dict(
+                    include={"quantity", "size", "information"}, exclude_none=True
+                )
+            )
+        else:
+            removes[operation.cart_id] = None
+
+    # any 404 below rolls back the whole batch
+    if updates:
+        updated = await con.fetch(
+            """
+            UPDATE cart c SET
+                quantity = COALESCE(u.quantity, c.quantity),
+                size = COALESCE(u.size, c.size),
+                information = COALESCE(u.information, c.information)
+            FROM unnest($2::int[], $3::int[], $4::text[], $5::text[])
+                AS u (id, quantity, size, information)
+            WHERE c.id = u.id AND c.mahasiswa_nim = $1
+            RETURNING c.id
+            """,
+            nim,
+            list(updates),
+            [update.get("quantity") for update in updates.values()],
+            [update.get("size") for update in updates.values()],
+            [update.get("information") for update in updates.values()],
+        )
+        missing = updates.keys() - {row["id"] for row in updated}
+        if missing:
+            raise HTTPException(404, f"Cart dengan id {sorted(missing)} tidak ditemukan")
+
+    if removes:
+        removed = await con.fetch(
+            "DELETE FROM cart WHERE mahasiswa_nim = $1 AND id = ANY($2::int[]) RETURNING id",
+            nim,
+            list(removes),
+        )
+        missing = removes.keys() - {row["id"] for row in removed}
+        if missing:
+            raise HTTPException(404, f"Cart dengan id {sorted(missing)} tidak ditemukan")
+
+    if adds:
+        # joining product skips unknown products instead of failing on the
+        # foreign key, so they can be reported as a 404
+        try:
+            added = await con.fetch(
+                """
+                INSERT INTO cart
+                    (mahasiswa_nim, product_id, quantity, size, information)
+                SELECT $1, a.product_id, a.quantity, a.size, a.information
+                FROM unnest($2::int[], $3::int[], $4::text[], $5::text[])
+                    WITH ORDINALITY AS a (product_id, quantity, size, information, n)
+                INNER JOIN product p ON a.product_id = p.id
+                ORDER BY a.n
+                RETURNING product_id
+                """,
+                nim,
+                [add.product_id for add in adds],
+                [add.quantity for add in adds],
+                [add.size for add in adds],
+                [add.information for add in adds],
+            )
+        except asyncpg.ForeignKeyViolationError:
+            raise await missing_reference(nim=nim)
+        missing = {add.product_id for add in adds} - {row["product_id"] for row in added}
+        if missing:
+            raise HTTPException(
+                404, f"Product dengan id {sorted(missing)} tidak ditemukan"
+            )
+
+    carts_db = await queries.fetch("student_carts", nim, con=con)
+    await con.release()
+
+    carts = [
+        _cart_from_row(cart, CartLine, line_total=cart["line_total"])
+        for cart in carts_db
+    ]
+
+    return BulkStudentCartResponse(
+        success=True,
+        message=f"Berhasil memproses {len(operations)} operasi cart",
+        carts=carts,
+        grand_total=sum(cart.line_total for cart in carts),
+    )
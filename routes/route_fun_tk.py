@@ -4,10 +4,10 @@ from asyncpg.exceptions import ForeignKeyViolationError
 from typing import Optional
 import datetime as dt
 
-from util import db
+from util import db, FastRoute
 from model import Response, Admin, FunTK, GetAllFunTKResponse, GetFunTKResponse
 
-fun_tk_router = APIRouter(prefix="/fun_tk", tags=["Fun TK"])
+fun_tk_router = APIRouter(prefix="/fun_tk", tags=["Fun TK"], route_class=FastRoute)
 
 
 @fun_tk_router.get("", response_model=GetAllFunTKResponse)
@@ -96,11 +96,7 @@ async def update_fun_tk(
     location: Optional[str] = None,
     map_url: Optional[str] = None,
 ):
-    fun_tk = await db.pool.fetchrow("SELECT * FROM fun_tk WHERE id = $1", fun_tk_id)
-    if not fun_tk:
-        raise HTTPException(404, f"Fun TK dengan id {fun_tk_id} tidak ditemukan")
-
-    await db.pool.execute(
+    updated = await db.pool.fetchval(
         """
         UPDATE fun_tk 
         SET 
@@ -112,6 +108,7 @@ async def update_fun_tk(
             title = COALESCE($6, title), 
             description = COALESCE($7, description) 
         WHERE id = $8
+        RETURNING id
         """,
         img_url,
         date,
@@ -122,16 +119,18 @@ async def update_fun_tk(
         description,
         fun_tk_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Fun TK dengan id {fun_tk_id} tidak ditemukan")
 
     return Response(success=True, message=f"Berhasil menyunting fun tk {fun_tk_id}")
 
 
 @fun_tk_router.delete("/{fun_tk_id}", response_model=Response)
 async def delete_fun_tk(fun_tk_id: int):
-    fun_tk = await db.pool.fetchrow("SELECT * FROM fun_tk WHERE id = $1", fun_tk_id)
-    if not fun_tk:
+    deleted = await db.pool.fetchval(
+        "DELETE FROM fun_tk WHERE id = $1 RETURNING id", fun_tk_id
+    )
+    if deleted is None:
         raise HTTPException(404, f"Fun TK dengan id {fun_tk_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM fun_tk WHERE id = $1", fun_tk_id)
-
     return Response(success=True, message=f"Berhasil menghapus fun tk {fun_tk_id}")
@@ -0,0 +1,208 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from typing import Optional
+import datetime as dt
+
+from util import db, stream_copy, pending_expiry_cutoff, jakarta_naive, FastRoute
+from cache import post_cache, student_cache, product_cache
+import queries
+from model import (
+    Response,
+    CacheStats,
+    IdentityCacheStats,
+    GetCacheStatsResponse,
+    QueryStats,
+    GetQueryStatsResponse,
+    PoolStats,
+    GetPoolStatsResponse,
+)
+
+
+internal_router = APIRouter(
+    prefix="/internal", tags=["Internal"], route_class=FastRoute
+)
+
+
+@internal_router.post("/post/like_count", response_model=Response)
+async def rebuild_post_like_count():
+    status = await db.pool.execute(
+        """
+        UPDATE post SET like_count = counted.like_count
+        FROM (
+            SELECT p.id, COUNT(l.post_id) AS like_count
+            FROM post p
+            LEFT JOIN "like" l ON l.post_id = p.id
+            GROUP BY p.id
+        ) counted
+        WHERE post.id = counted.id AND post.like_count <> counted.like_count
+        """
+    )
+    fixed = int(status.split()[-1])
+
+    return Response(
+        success=True, message=f"Berhasil menghitung ulang like count ({fixed} post diperbaiki)"
+    )
+
+
+@internal_router.get("/cache", response_model=GetCacheStatsResponse)
+async def get_cache_stats():
+    return GetCacheStatsResponse(
+        success=True,
+        message="Berhasil mengambil statistik cache",
+        post_cache=CacheStats(**post_cache.stats()),
+        student_cache=IdentityCacheStats(**student_cache.stats()),
+        product_cache=IdentityCacheStats(**product_cache.stats()),
+    )
+
+
+@internal_router.get("/queries", response_model=GetQueryStatsResponse)
+async def get_query_stats():
+    statements = [
+        QueryStats(name=name, executions=executions, total_ms=total * 1000)
+        for name, (executions, total) in queries.stats.items()
+    ]
+
+    return GetQueryStatsResponse(
+        success=True,
+        message="Berhasil mengambil statistik query",
+        statements=statements,
+    )
+
+
+@internal_router.get("/pool", response_model=GetPoolStatsResponse)
+async def get_pool_stats():
+    return GetPoolStatsResponse(
+        success=True,
+        message="Berhasil mengambil statistik pool database",
+        pool=PoolStats(**db.pool_stats()),
+    )
+
+
+# exports, streamed straight from COPY so memory stays flat at any size
+@internal_router.get("/export/orders")
+async def export_orders(
+    date_from: Optional[dt.datetime] = None,
+    date_to: Optional[dt.datetime] = None,
+    status: Optional[str] = None,
+):
+    rows = stream_copy(
+        """
+        SELECT
+            o.id AS order_id,
+            t.id AS transaction_id,
+            t.transaction_date,
+            t.status,
+            t.paid,
+            t.completed,
+            m.nim,
+            m.name,
+            m.email,
+            m.tel,
+            p.id AS product_id,
+            p.name AS product_name,
+            p.price,
+            o.quantity,
+            o.size,
+            o.information,
+            p.price * o.quantity AS subtotal
+        FROM "order" o
+        JOIN product p ON o.product_id = p.id
+        JOIN mahasiswa m ON o.mahasiswa_nim = m.nim
+        LEFT JOIN (
+            SELECT
+                id,
+                transaction_date,
+                paid,
+                completed,
+                CASE
+                    WHEN status = 'pending' AND transaction_date <= $1 THEN 'expire'
+                    ELSE status
+                END AS status
+            FROM transaction
+            WHERE payment_url IS NOT NULL
+        ) t ON o.transaction_id = t.id
+        WHERE
+            ($2::timestamp IS NULL OR t.transaction_date >= $2)
+            AND ($3::timestamp IS NULL OR t.transaction_date < $3)
+            AND ($4::text IS NULL OR t.status = $4)
+        ORDER BY t.transaction_date, o.id
+        """,
+        pending_expiry_cutoff(),
+        jakarta_naive(date_from),
+        jakarta_naive(date_to),
+        status,
+    )
+
+    return StreamingResponse(
+        rows,
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="orders.csv"'},
+    )
+
+
+@internal_router.get("/export/transactions")
+async def export_transactions(
+    date_from: Optional[dt.datetime] = None,
+    date_to: Optional[dt.datetime] = None,
+    status: Optional[str] = None,
+):
+    rows = stream_copy(
+        """
+        SELECT
+            t.id AS transaction_id,
+            t.transaction_date,
+            t.status,
+            t.paid,
+            t.completed,
+            t.payment_url,
+            m.nim,
+            m.name,
+            m.email,
+            m.tel,
+            COUNT(o.id) AS order_count,
+            SUM(o.quantity) AS item_count,
+            SUM(p.price * o.quantity) AS total
+        FROM (
+            SELECT
+                id,
+                mahasiswa_nim,
+                transaction_date,
+                paid,
+                completed,
+                payment_url,
+                CASE
+                    WHEN status = 'pending' AND transaction_date <= $1 THEN 'expire'
+                    ELSE status
+                END AS status
+            FROM transaction
+            WHERE payment_url IS NOT NULL
+        ) t
+        JOIN mahasiswa m ON t.mahasiswa_nim = m.nim
+        JOIN "order" o ON o.transaction_id = t.id
+        JOIN product p ON o.product_id = p.id
+        WHERE
+            ($2::timestamp IS NULL OR t.transaction_date >= $2)
+            AND ($3::timestamp IS NULL OR t.transaction_date < $3)
+            AND ($4::text IS NULL OR t.status = $4)
+        GROUP BY
+            t.id,
+            t.transaction_date,
+            t.status,
+            t.paid,
+            t.completed,
+            t.payment_url,
+            m.nim
+        ORDER BY t.transaction_date, t.id
+        """,
+        pending_expiry_cutoff(),
+        jakarta_naive(date_from),
+        jakarta_naive(date_to),
+        status,
+    )
+
+    return StreamingResponse(
+        rows,
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transactions.csv"'},
+    )
@@ -4,11 +4,13 @@ from asyncpg.exceptions import ForeignKeyViolationError
 from typing import Literal, Optional
 import datetime as dt
 
-from util import db
+from util import db, FastRoute
 from model import Response, Admin, LabPost, GetAllLabPostResponse, GetLabPostResponse
 
 
-lab_post_router = APIRouter(prefix="/lab_post", tags=["Lab Post"])
+lab_post_router = APIRouter(
+    prefix="/lab_post", tags=["Lab Post"], route_class=FastRoute
+)
 
 
 @lab_post_router.get("", response_model=GetAllLabPostResponse)
@@ -79,30 +81,24 @@ async def add_lab_post(
 async def update_lab_post(
     lab_post_id: int, content: Optional[str] = None, img_url: Optional[str] = None
 ):
-    lab_post = await db.pool.fetchrow(
-        "SELECT * FROM lab_post WHERE id = $1", lab_post_id
-    )
-    if not lab_post:
-        raise HTTPException(404, f"Lab post dengan id {lab_post_id} tidak ditemukan")
-
-    await db.pool.execute(
-        "UPDATE lab_post SET content = COALESCE($1, content), img_url = COALESCE($2, img_url) WHERE id = $3",
+    updated = await db.pool.fetchval(
+        "UPDATE lab_post SET content = COALESCE($1, content), img_url = COALESCE($2, img_url) WHERE id = $3 RETURNING id",
         content,
         img_url,
         lab_post_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Lab post dengan id {lab_post_id} tidak ditemukan")
 
     return Response(success=True, message=f"Berhasil menyunting lab post {lab_post_id}")
 
 
 @lab_post_router.delete("/{lab_post_id}", response_model=Response)
 async def delete_lab_post(lab_post_id: int):
-    lab_post = await db.pool.fetchrow(
-        "SELECT * FROM lab_post WHERE id = $1", lab_post_id
+    deleted = await db.pool.fetchval(
+        "DELETE FROM lab_post WHERE id = $1 RETURNING id", lab_post_id
     )
-    if not lab_post:
+    if deleted is None:
         raise HTTPException(404, f"Lab post dengan id {lab_post_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM lab_post WHERE id = $1", lab_post_id)
-
     return Response(success=True, message=f"Berhasil menghapus lab post {lab_post_id}")
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
 
-from util import db, verify_signature
+from util import db, verify_signature, FastRoute
 
 import datetime as dt
 
-midtrans_router = APIRouter(prefix="/transaction", tags=["MIDTRANS"])
+midtrans_router = APIRouter(
+    prefix="/transaction", tags=["MIDTRANS"], route_class=FastRoute
+)
 
 
 @midtrans_router.get("/midtrans_callback")
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException
+import asyncpg
 
 from typing import Optional, Literal
 import datetime as dt
 
-from util import db
+from util import db, FastRoute
+from cache import student_cache, product_cache, missing_reference
 from model import (
     Response,
     Order,
@@ -11,16 +13,17 @@ from model import (
     Student,
     GetOrderResponse,
     GetAllOrderResponse,
+    hydrate,
 )
 
 
-order_router = APIRouter(prefix="/order", tags=["Order"])
+order_router = APIRouter(prefix="/order", tags=["Order"], route_class=FastRoute)
 
 
 @order_router.get("", response_model=GetAllOrderResponse)
 async def get_all_orders(nim: int = None):
     if nim:
-        student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+        student = await student_cache.get(nim)
         if not student:
             raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
         
@@ -78,37 +81,20 @@ async def get_all_orders(nim: int = None):
             """
         )
 
-    orders = []
-    for order in orders_db:
-        product = Product(
-            id=order["product_id"],
-            name=order["product_name"],
-            price=order["product_price"],
-            description=order["product_desc"],
-            img_url=order["product_img_url"],
-        )
-        mahasiswa = Student(
-            nim=order["mhs_nim"],
-            name=order["mhs_name"],
-            tel=order["mhs_tel"],
-            email=order["mhs_email"],
-            avatar_url=order["mhs_avatar_url"],
-            address=order["mhs_address"],
-            pass_hash=order["mhs_pass_hash"],
-        )
-        orders.append(
-            Order(
-                id=order["order_id"],
-                mahasiswa=mahasiswa,
-                product=product,
-                quantity=order["quantity"],
-                size=order["size"],
-                information=order["information"],
-                # order_date=order["order_date"],
-                # paid=order["paid"],
-                # completed=order["completed"],
-            )
+    orders = [
+        hydrate(
+            Order,
+            order,
+            columns={"id": "order_id"},
+            product=hydrate(
+                Product,
+                order,
+                prefix="product_",
+                columns={"id": "product_id", "description": "product_desc"},
+            ),
         )
+        for order in orders_db
+    ]
 
     return GetAllOrderResponse(
         success=True, message="Berhasil mengambil data semua order", orders=orders
@@ -191,27 +177,30 @@ async def add_order(
     size: Literal["xs", "s", "m", "l", "xl", "xxl"],
     information: Optional[str] = None,
 ):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    product = await db.pool.fetchrow("SELECT * FROM product WHERE id = $1", product_id)
+    product = await product_cache.get(product_id)
     if not product:
         raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
 
-    await db.pool.execute(
-        """
-        INSERT INTO "order"
-            (mahasiswa_nim, product_id, quantity, size, information)
-        VALUES
-            ($1, $2, $3, $4, $5, $6, $7, $8)
-    """,
-        nim,
-        product_id,
-        quantity,
-        size,
-        information,
-    )
+    try:
+        await db.pool.execute(
+            """
+            INSERT INTO "order"
+                (mahasiswa_nim, product_id, quantity, size, information)
+            VALUES
+                ($1, $2, $3, $4, $5, $6, $7, $8)
+        """,
+            nim,
+            product_id,
+            quantity,
+            size,
+            information,
+        )
+    except asyncpg.ForeignKeyViolationError:
+        raise await missing_reference(nim=nim, product_id=product_id)
 
     return Response(success=True, message="Berhasil menambahkan order baru")
 
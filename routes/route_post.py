@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncpg
+from pydantic import parse_obj_as
 
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 import datetime as dt
 
-from util import db
+from util import (
+    db,
+    encode_cursor,
+    decode_cursor,
+    FastRoute,
+    LazyConnection,
+    db_connection,
+)
+import queries
+from cache import liked_posts, post_cache, student_cache, missing_reference
 from model import (
     Response,
     Post,
@@ -14,240 +25,110 @@ from model import (
     GetCommentResponse,
     GetAllPostResponse,
     GetPostResponse,
+    ToggleLikeResponse,
+    hydrate,
 )
 
-post_router = APIRouter(prefix="/post", tags=["Post"])
+post_router = APIRouter(prefix="/post", tags=["Post"], route_class=FastRoute)
 
 
 @post_router.get("", response_model=GetAllPostResponse)
-async def get_all_posts(user_id: Optional[int] = None):
-    if user_id is None:
-        posts_db = await db.pool.fetch(
-            """
-            SELECT 
-                post.id, 
-                post.poster_id, 
-                post.post_date,
-                post.img_url,
-                post.content,
-                post.can_comment,
-                mahasiswa.name AS mahasiswa_name,
-                mahasiswa.tel AS mahasiswa_tel,
-                mahasiswa.email AS mahasiswa_email,
-                mahasiswa.avatar_url AS mahasiswa_avatar_url,
-                mahasiswa.address AS mahasiswa_address,
-                mahasiswa.pass_hash AS mahasiswa_pass_hash,
-                COUNT(DISTINCT l.liker_id) AS current_like_count
-            FROM post
-            LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
-            LEFT JOIN "like" l ON post.id = l.post_id
-            GROUP BY
-                post.id,
-                mahasiswa.name,
-                mahasiswa.tel,
-                mahasiswa.email,
-                mahasiswa.avatar_url,
-                mahasiswa.address,
-                mahasiswa.pass_hash
-            ORDER BY post.post_date DESC
-        """
-        )
+async def get_all_posts(
+    user_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    comment_preview: int = Query(0, ge=0, le=10),
+):
+    # keyset pagination over (post_date, id), the first page starts after the
+    # latest possible key so every page uses the same index range scan
+    if cursor is None:
+        after_date, after_id = dt.datetime.max, 0
     else:
-        posts_db = await db.pool.fetch(
-            """
-            SELECT 
-                post.id, 
-                post.poster_id, 
-                post.post_date,
-                post.img_url,
-                post.content,
-                post.can_comment,
-                mahasiswa.name AS mahasiswa_name,
-                mahasiswa.tel AS mahasiswa_tel,
-                mahasiswa.email AS mahasiswa_email,
-                mahasiswa.avatar_url AS mahasiswa_avatar_url,
-                mahasiswa.address AS mahasiswa_address,
-                mahasiswa.pass_hash AS mahasiswa_pass_hash,
-                COUNT(l.liker_id) AS current_like_count,
-                EXISTS (
-                    SELECT 1
-                    FROM "like"
-                    WHERE "like".post_id = post.id AND "like".liker_id = $1
-                ) AS is_liked
-            FROM post
-            LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
-            LEFT JOIN "like" l ON post.id = l.post_id
-            GROUP BY
-                post.id,
-                mahasiswa.name,
-                mahasiswa.tel,
-                mahasiswa.email,
-                mahasiswa.avatar_url,
-                mahasiswa.address,
-                mahasiswa.pass_hash
-            ORDER BY post.post_date DESC
-        """,
-            user_id,
+        after_date, after_id = decode_cursor(cursor)
+
+    async def load():
+        posts_db = await queries.fetch(
+            "post_feed_page",
+            after_date,
+            after_id,
+            limit,
+            comment_preview,
         )
 
-    posts = []
-    for post in posts_db:
-        poster = Student(
-            nim=post["poster_id"],
-            name=post["mahasiswa_name"],
-            tel=post["mahasiswa_tel"],
-            email=post["mahasiswa_email"],
-            avatar_url=post["mahasiswa_avatar_url"],
-            address=post["mahasiswa_address"],
-            pass_hash=post["mahasiswa_pass_hash"],
-        )
+        posts = [_post_from_row(post) for post in posts_db]
 
-        if user_id is None:
-            posts.append(
-                Post(
-                    id=post["id"],
-                    poster=poster,
-                    post_date=post["post_date"],
-                    img_url=post["img_url"],
-                    content=post["content"],
-                    current_like_count=post["current_like_count"],
-                    can_comment=post["can_comment"],
-                )
-            )
-        else:
-            posts.append(
-                Post(
-                    id=post["id"],
-                    poster=poster,
-                    post_date=post["post_date"],
-                    img_url=post["img_url"],
-                    content=post["content"],
-                    current_like_count=post["current_like_count"],
-                    can_comment=post["can_comment"],
-                    is_liked=post["is_liked"],
-                )
-            )
+        next_cursor = None
+        if len(posts_db) == limit:
+            next_cursor = encode_cursor(posts_db[-1]["post_date"], posts_db[-1]["id"])
+
+        return (posts, next_cursor), _post_tags(posts, "feed")
+
+    posts, next_cursor = await post_cache.get(
+        ("feed", limit, cursor, comment_preview), load
+    )
+
+    if user_id is not None:
+        liked = await liked_posts.get(user_id)
+        posts = [post.copy(update={"is_liked": post.id in liked}) for post in posts]
 
     return GetAllPostResponse(
-        success=True, message="Berhasil mengambil data semua post", posts=posts
+        success=True,
+        message="Berhasil mengambil data semua post",
+        posts=posts,
+        next_cursor=next_cursor,
     )
 
 
 @post_router.get("/{post_id}", response_model=GetPostResponse)
-async def get_post(post_id: int, user_id: Optional[int] = None):
-    if user_id is None:
-        post = await db.pool.fetchrow(
-            """
-            SELECT 
-                post.id, 
-                post.poster_id, 
-                post.post_date,
-                post.img_url,
-                post.content,
-                post.can_comment,
-                mahasiswa.name AS mahasiswa_name,
-                mahasiswa.tel AS mahasiswa_tel,
-                mahasiswa.email AS mahasiswa_email,
-                mahasiswa.avatar_url AS mahasiswa_avatar_url,
-                mahasiswa.address AS mahasiswa_address,
-                mahasiswa.pass_hash AS mahasiswa_pass_hash,
-                COUNT("like".liker_id) AS current_like_count
-            FROM post
-            LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
-            LEFT JOIN "like" ON post.id = "like".post_id
-            WHERE post.id = $1
-            GROUP BY
-                post.id,
-                mahasiswa.name,
-                mahasiswa.tel,
-                mahasiswa.email,
-                mahasiswa.avatar_url,
-                mahasiswa.address,
-                mahasiswa.pass_hash
-            ORDER BY post.post_date DESC
-        """,
-            post_id,
-        )
-    else:
-        post = await db.pool.fetchrow(
-            """
-            SELECT 
-                post.id, 
-                post.poster_id, 
-                post.post_date,
-                post.img_url,
-                post.content,
-                post.can_comment,
-                mahasiswa.name AS mahasiswa_name,
-                mahasiswa.tel AS mahasiswa_tel,
-                mahasiswa.email AS mahasiswa_email,
-                mahasiswa.avatar_url AS mahasiswa_avatar_url,
-                mahasiswa.address AS mahasiswa_address,
-                mahasiswa.pass_hash AS mahasiswa_pass_hash,
-                COUNT("like".liker_id) AS current_like_count,
-                EXISTS (
-                    SELECT 1
-                    FROM "like"
-                    WHERE "like".post_id = post.id AND "like".liker_id = $1
-                ) AS is_liked
-            FROM post
-            LEFT JOIN mahasiswa ON post.poster_id = mahasiswa.nim
-            LEFT JOIN "like" ON post.id = "like".post_id
-            WHERE post.id = $2
-            GROUP BY
-                post.id,
-                mahasiswa.name,
-                mahasiswa.tel,
-                mahasiswa.email,
-                mahasiswa.avatar_url,
-                mahasiswa.address,
-                mahasiswa.pass_hash
-            ORDER BY post.post_date DESC
-        """,
-            user_id,
-            post_id,
-        )
+async def get_post(
+    post_id: int,
+    user_id: Optional[int] = None,
+    comment_preview: int = Query(0, ge=0, le=10),
+):
+    async def load():
+        post = await queries.fetchrow("post_by_id", post_id, comment_preview)
 
-    if not post:
-        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
+        if not post:
+            return None, ()
+        post_obj = _post_from_row(post)
+        return post_obj, _post_tags([post_obj])
 
-    poster = Student(
-        nim=post["poster_id"],
-        name=post["mahasiswa_name"],
-        tel=post["mahasiswa_tel"],
-        email=post["mahasiswa_email"],
-        avatar_url=post["mahasiswa_avatar_url"],
-        address=post["mahasiswa_address"],
-        pass_hash=post["mahasiswa_pass_hash"],
-    )
+    post_obj = await post_cache.get(("post", post_id, comment_preview), load)
+    if not post_obj:
+        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
 
-    if user_id is None:
-        post_obj = Post(
-            id=post["id"],
-            poster=poster,
-            post_date=post["post_date"],
-            img_url=post["img_url"],
-            content=post["content"],
-            current_like_count=post["current_like_count"],
-            can_comment=post["can_comment"],
-        )
-    else:
-        post_obj = Post(
-            id=post["id"],
-            poster=poster,
-            post_date=post["post_date"],
-            img_url=post["img_url"],
-            content=post["content"],
-            current_like_count=post["current_like_count"],
-            can_comment=post["can_comment"],
-            is_liked=post["is_liked"],
-        )
+    if user_id is not None:
+        liked = await liked_posts.get(user_id)
+        post_obj = post_obj.copy(update={"is_liked": post_obj.id in liked})
 
     return GetPostResponse(
         success=True, message="Berhasil mengambil data post", post=post_obj
     )
 
 
+def _post_from_row(post):
+    poster = hydrate(Student, post, prefix="mahasiswa_", columns={"nim": "poster_id"})
+
+    # comment previews come from json_agg as plain json, so they are validated
+    latest_comments = post["latest_comments"]
+    if latest_comments is not None:
+        latest_comments = parse_obj_as(List[Comment], latest_comments)
+
+    return hydrate(Post, post, poster=poster, latest_comments=latest_comments)
+
+
+def _post_tags(posts, *tags):
+    # cached posts are dropped when the post itself, its poster or one of the
+    # previewed commenters changes
+    tags = set(tags)
+    for post in posts:
+        tags.add(f"post:{post.id}")
+        tags.add(f"student:{post.poster.nim}")
+        for comment in post.latest_comments or []:
+            tags.add(f"student:{comment.commenter.nim}")
+    return tags
+
+
 @post_router.post("", response_model=Response)
 async def add_post(
     poster_id: int,
@@ -256,23 +137,27 @@ async def add_post(
     can_comment: bool,
     img_url: str = None,
 ):
-    poster = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", poster_id)
+    poster = await student_cache.get(poster_id)
     if not poster:
         raise HTTPException(404, f"Mahasiswa dengan nim {poster_id} tidak ditemukan")
 
-    await db.pool.execute(
-        """
-        INSERT INTO post 
-            (poster_id, post_date, img_url, content, can_comment) 
-        VALUES 
-            ($1, $2, $3, $4, $5)
-        """,
-        poster_id,
-        post_date,
-        img_url,
-        content,
-        can_comment,
-    )
+    try:
+        await db.pool.execute(
+            """
+            INSERT INTO post 
+                (poster_id, post_date, img_url, content, can_comment) 
+            VALUES 
+                ($1, $2, $3, $4, $5)
+            """,
+            poster_id,
+            post_date,
+            img_url,
+            content,
+            can_comment,
+        )
+    except asyncpg.ForeignKeyViolationError:
+        raise await missing_reference(nim=poster_id)
+    post_cache.invalidate("feed")
 
     return Response(success=True, message="Berhasil menambahkan post baru")
 
@@ -284,86 +169,90 @@ async def update_post(
     content: Optional[str] = None,
     can_comment: Optional[bool] = None,
 ):
-    post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
-    if not post:
-        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
-
-    await db.pool.execute(
-        "UPDATE post SET img_url = COALESCE($1, img_url), content = COALESCE($2, content), can_comment = COALESCE($3, can_comment) WHERE id = $4",
+    updated = await db.pool.fetchval(
+        "UPDATE post SET img_url = COALESCE($1, img_url), content = COALESCE($2, content), can_comment = COALESCE($3, can_comment) WHERE id = $4 RETURNING id",
         img_url,
         content,
         can_comment,
         post_id,
     )
+    if updated is None:
+        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
+    post_cache.invalidate(f"post:{post_id}")
 
     return Response(success=True, message=f"Berhasil menyunting post {post_id}")
 
 
 @post_router.delete("/{post_id}", response_model=Response)
 async def delete_post(post_id: int):
-    post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
-    if not post:
+    deleted = await db.pool.fetchval(
+        "DELETE FROM post WHERE id = $1 RETURNING id", post_id
+    )
+    if deleted is None:
         raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
-
-    await db.pool.execute("DELETE FROM post WHERE id = $1", post_id)
+    post_cache.invalidate(f"post:{post_id}")
 
     return Response(success=True, message=f"Berhasil menghapus post {post_id}")
 
 
 # likes
-@post_router.post("/{post_id}/like", response_model=Response)
-async def toggle_post_like(post_id: int, user_id: int):
-    post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
-    if not post:
+@post_router.post("/{post_id}/like", response_model=ToggleLikeResponse)
+async def toggle_post_like(
+    post_id: int,
+    user_id: int,
+    con: LazyConnection = Depends(db_connection(transaction=True)),
+):
+    # wait for other toggles of the same like, then one statement toggles the
+    # like row, keeps post.like_count in step and reports whether the post
+    # and the student exist
+    await queries.execute("post_like_lock", post_id, user_id, con=con)
+    result = await queries.fetchrow("post_like_toggle", post_id, user_id, con=con)
+    await con.release()
+
+    if not result["post_exists"]:
         raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
-    
-    user = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", user_id)
-    if not user:
+    if not result["user_exists"]:
         raise HTTPException(404, f"Mahasiswa dengan nim {user_id} tidak ditemukan")
 
-    like_exists = await db.pool.fetchval(
-        'SELECT 1 FROM "like" WHERE post_id = $1 AND liker_id = $2', post_id, user_id
-    )
-    if like_exists:
-        await db.pool.execute(
-            'DELETE FROM "like" WHERE post_id = $1 AND liker_id = $2', post_id, user_id
-        )
+    liked_posts.set_liked(user_id, post_id, result["is_liked"])
+    post_cache.invalidate(f"post:{post_id}")
+
+    if result["is_liked"]:
+        message = "Berhasil menambahkan like baru"
     else:
-        await db.pool.execute(
-            'INSERT INTO "like" (post_id, liker_id) VALUES ($1, $2)', post_id, user_id
-        )
+        message = "Berhasil menghapus like"
 
-    return Response(success=True, message="Berhasil menambahkan like baru")
+    return ToggleLikeResponse(
+        success=True,
+        message=message,
+        is_liked=result["is_liked"],
+        current_like_count=result["like_count"],
+    )
 
 
 # comment
 @post_router.get("/{post_id}/comment", response_model=GetAllCommentResponse)
-async def get_all_post_comments(post_id: int):
+async def get_all_post_comments(
+    post_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    # keyset pagination over (comment_date, id), oldest comment first
+    if cursor is None:
+        after_date, after_id = dt.datetime.min, 0
+    else:
+        after_date, after_id = decode_cursor(cursor)
+
     post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
     if not post:
         raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
 
-    comments_db = await db.pool.fetch(
-        """
-        SELECT
-            cm.id,
-            cm.comment_date,
-            cm.content,
-            cm.post_id,
-            m.nim AS student_nim, 
-            m.name AS student_name, 
-            m.tel AS student_tel, 
-            m.email AS student_email, 
-            m.avatar_url AS student_avatar_url, 
-            m.address AS student_address, 
-            m.pass_hash AS student_pass_hash 
-        FROM comment cm
-        LEFT JOIN mahasiswa m
-        ON cm.commenter_id = m.nim
-        WHERE cm.post_id = $1
-        ORDER BY cm.post_id
-        """,
+    comments_db = await queries.fetch(
+        "post_comments_page",
         post_id,
+        after_date,
+        after_id,
+        limit,
     )
 
     comments = []
@@ -387,8 +276,17 @@ async def get_all_post_comments(post_id: int):
             )
         )
 
+    next_cursor = None
+    if len(comments_db) == limit:
+        next_cursor = encode_cursor(
+            comments_db[-1]["comment_date"], comments_db[-1]["id"]
+        )
+
     return GetAllCommentResponse(
-        success=True, message="Berhasil mengambil data semua comment", comments=comments
+        success=True,
+        message="Berhasil mengambil data semua comment",
+        comments=comments,
+        next_cursor=next_cursor,
     )
 
 
@@ -396,33 +294,44 @@ async def get_all_post_comments(post_id: int):
 async def add_comment(
     post_id: int, commenter_id: int, comment_date: dt.datetime, content: str
 ):
-    post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
-    if not post:
-        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
-
-    await db.pool.execute(
-        "INSERT INTO comment (post_id, commenter_id, comment_date, content) VALUES ($1, $2, $3, $4)",
+    # inserts nothing when the post does not exist
+    comment_id = await db.pool.fetchval(
+        "INSERT INTO comment (post_id, commenter_id, comment_date, content) SELECT id, $2, $3, $4 FROM post WHERE id = $1 RETURNING id",
         post_id,
         commenter_id,
         comment_date,
         content,
     )
+    if comment_id is None:
+        raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
+    post_cache.invalidate(f"post:{post_id}")
 
     return Response(success=True, message="Berhasil menambahkan comment baru")
 
 
 @post_router.delete("/{post_id}/comment/{comment_id}", response_model=Response)
 async def delete_comment(post_id: int, comment_id: int):
-    post = await db.pool.fetchrow("SELECT * FROM post WHERE id = $1", post_id)
-    if not post:
+    result = await db.pool.fetchrow(
+        """
+        WITH deleted AS (
+            DELETE FROM comment
+            WHERE id = $2 AND EXISTS (SELECT 1 FROM post WHERE id = $1)
+            RETURNING id
+        )
+        SELECT
+            EXISTS (SELECT 1 FROM post WHERE id = $1) AS post_exists,
+            EXISTS (SELECT 1 FROM deleted) AS deleted
+        """,
+        post_id,
+        comment_id,
+    )
+    if not result["post_exists"]:
         raise HTTPException(404, f"Post dengan id {post_id} tidak ditemukan")
-    
-    comment = await db.pool.fetchrow("SELECT * FROM comment WHERE id = $1", comment_id)
-    if not comment:
-        
+
+    if not result["deleted"]:
         raise HTTPException(404, f"Comment dengan id {comment_id} tidak ditemuka")
-    
-    await db.pool.execute("DELETE FROM comment WHERE id = $1", comment_id)
+
+    post_cache.invalidate(f"post:{post_id}")
 
     return Response(success=True, message="Berhasil menghapus comment")
     
@@ -2,11 +2,12 @@ from fastapi import APIRouter, HTTPException
 
 from typing import Optional
 
-from util import db
+from util import db, FastRoute
+from cache import product_cache
 from model import Product, Response, GetAllProductResponse, GetProductResponse
 
 
-product_router = APIRouter(prefix="/product", tags=["Product"])
+product_router = APIRouter(prefix="/product", tags=["Product"], route_class=FastRoute)
 
 
 @product_router.get("", response_model=GetAllProductResponse)
@@ -32,9 +33,7 @@ async def get_all_products():
 
 @product_router.get("/{product_id}", response_model=GetProductResponse)
 async def get_product(product_id: int):
-    product_db = await db.pool.fetchrow(
-        "SELECT * FROM product WHERE id = $1", product_id
-    )
+    product_db = await product_cache.get(product_id)
 
     if not product_db:
         raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
@@ -54,18 +53,21 @@ async def get_product(product_id: int):
 
 @product_router.post("", response_model=Response)
 async def add_product(name: str, price: int, description: str, img_url: str):
-    await db.pool.execute(
+    product_id = await db.pool.fetchval(
         """
         INSERT INTO product
             (name, price, description, img_url)
         VALUES
             ($1, $2, $3, $4)
+        RETURNING id
         """,
         name,
         price,
         description,
         img_url,
     )
+    # drop a cached "not found" for the new id
+    product_cache.invalidate(product_id)
 
     return Response(success=True, message="Berhasil menambahkan product baru")
 
@@ -78,14 +80,7 @@ async def update_product(
     description: Optional[str] = None,
     img_url: Optional[str] = None,
 ):
-    product_db = await db.pool.fetchrow(
-        "SELECT * FROM product WHERE id = $1", product_id
-    )
-
-    if not product_db:
-        raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
-
-    await db.pool.execute(
+    updated = await db.pool.fetchval(
         """
         UPDATE product SET 
             name = COALESCE($1, name), 
@@ -93,6 +88,7 @@ async def update_product(
             description = COALESCE($3, description), 
             img_url = COALESCE($4, img_url) 
         WHERE id = $5
+        RETURNING id
         """,
         name,
         price,
@@ -100,6 +96,10 @@ async def update_product(
         img_url,
         product_id,
     )
+    product_cache.invalidate(product_id)
+
+    if updated is None:
+        raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
 
     return Response(
         success=True, message=f"Berhasil menyunting product {product_id}"
@@ -108,13 +108,12 @@ async def update_product(
 
 @product_router.delete("/{product_id}", response_model=Response)
 async def delete_product(product_id: int):
-    product_db = await db.pool.fetchrow(
-        "SELECT * FROM product WHERE id = $1", product_id
+    deleted = await db.pool.fetchval(
+        "DELETE FROM product WHERE id = $1 RETURNING id", product_id
     )
+    product_cache.invalidate(product_id)
 
-    if not product_db:
+    if deleted is None:
         raise HTTPException(404, f"Product dengan id {product_id} tidak ditemukan")
 
-    await db.pool.execute("DELETE FROM product WHERE id = $1", product_id)
-
     return Response(success=True, message=f"Berhasil menghapus product {product_id}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from asyncpg.exceptions import UniqueViolationError
 
 from model import (
@@ -6,11 +6,12 @@ from model import (
     GetAllStudentResponse,
     GetStudentResponse,
 )
-from util import db, hash_str
+from util import db, hash_str, FastRoute, LazyConnection, db_connection
+from cache import liked_posts, post_cache, student_cache
 from typing import Optional
 
 
-student_router = APIRouter(prefix="/student", tags=["Student"])
+student_router = APIRouter(prefix="/student", tags=["Student"], route_class=FastRoute)
 
 
 @student_router.get("", response_model=GetAllStudentResponse)
@@ -26,7 +27,7 @@ async def get_all_student():
 
 @student_router.get("/{nim}", response_model=GetStudentResponse)
 async def get_student(nim: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         return GetStudentResponse(
             success=False, message=f"Mahasiswa dengan nim {nim} tidak ditemukan", mahasiswa=None
@@ -67,6 +68,8 @@ async def add_student(
             address or "-",
             pass_hash,
         )
+        # drop a cached "not found" for this nim
+        student_cache.invalidate(nim)
     except UniqueViolationError:
         return Response(success=True, message=f"Data mahasiswa dengan NIM {nim} sudah ada")
         # raise HTTPException(409, f"Data mahasiswa dengan NIM {nim} sudah ada")
@@ -89,12 +92,8 @@ async def update_student(
     else:
         pass_hash = None
 
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
-    if not student:
-        raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
-
-    await db.pool.execute(
-        "UPDATE mahasiswa SET name = COALESCE($1, name), tel = COALESCE($2, tel), email = COALESCE($3, email), pass_hash = COALESCE($4, pass_hash), avatar_url = COALESCE($5, avatar_url), address = COALESCE($6, address) WHERE nim = $7",
+    updated = await db.pool.fetchval(
+        "UPDATE mahasiswa SET name = COALESCE($1, name), tel = COALESCE($2, tel), email = COALESCE($3, email), pass_hash = COALESCE($4, pass_hash), avatar_url = COALESCE($5, avatar_url), address = COALESCE($6, address) WHERE nim = $7 RETURNING nim",
         name,
         tel,
         email,
@@ -103,20 +102,52 @@ async def update_student(
         address,
         nim,
     )
+    student_cache.invalidate(nim)
+    if updated is None:
+        raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
+
+    post_cache.invalidate(f"student:{nim}")
 
     return Response(success=True, message=f"Berhasil menyunting mahasiswa {nim}")
 
 
 @student_router.delete("/{nim}", response_model=Response)
-async def delete_student(nim: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+async def delete_student(
+    nim: int, con: LazyConnection = Depends(db_connection(transaction=True))
+):
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    await db.pool.execute(
+    await con.execute(
         "DELETE FROM post WHERE poster_id = $1",
         nim,
     )
-    await db.pool.execute("DELETE FROM mahasiswa WHERE nim = $1", nim)
+    # keep post.like_count in step with the likes this student leaves behind
+    unliked = await con.fetch(
+        """
+        WITH removed AS (
+            DELETE FROM "like" WHERE liker_id = $1 RETURNING post_id
+        ),
+        -- UPDATE ... FROM touches each post once, so duplicate likes from
+        -- before the unique index are counted up front
+        per_post AS (
+            SELECT post_id, COUNT(*) AS likes FROM removed GROUP BY post_id
+        )
+        UPDATE post SET like_count = like_count - per_post.likes
+        FROM per_post
+        WHERE post.id = per_post.post_id
+        RETURNING post.id
+        """,
+        nim,
+    )
+    await con.execute("DELETE FROM mahasiswa WHERE nim = $1", nim)
+    # commit before dropping cached state, so it can't be reloaded stale
+    await con.release()
+    student_cache.invalidate(nim)
+    liked_posts.forget(nim)
+    post_cache.invalidate(
+        f"student:{nim}", *(f"post:{post['id']}" for post in unliked)
+    )
 
     return Response(success=True, message=f"Berhasil menghapus mahasiswa {nim}")
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import RedirectResponse
 
 from typing import List, Optional
+import asyncio
 import datetime as dt
 import pytz
 
-from util import create_transaction, db
+from util import (
+    create_transaction,
+    db,
+    pending_expiry_cutoff,
+    jakarta_naive,
+    encode_cursor,
+    decode_cursor,
+    FastRoute,
+)
+import queries
+from cache import student_cache
 from model import (
     AddTransactionResponse,
     GetAllTransactionResponse,
@@ -13,129 +24,93 @@ from model import (
     GetStudentTransactionResponse,
     Response,
     Student,
-    Order,
     Transaction,
     StudentTransaction,
 )
 
 
-transaction_router = APIRouter(prefix="/student", tags=["Transaction"])
+transaction_router = APIRouter(
+    prefix="/student", tags=["Transaction"], route_class=FastRoute
+)
 
 
 @transaction_router.get(
     "/{nim}/transactions_all", response_model=GetAllTransactionResponse
 )
-async def get_all_transactions(nim: int):
-    transactions_db = await db.pool.fetch(
-        """
-        SELECT
-            t.id AS transaction_id,
-            t.transaction_date,
-            t.paid,
-            t.completed,
-            t.payment_url,
-            t.status,
-            o.id AS order_id,
-            o.product_id,
-            o.quantity,
-            o.size,
-            o.information,
-            p.name AS product_name,
-            p.price AS product_price,
-            p.description AS product_description,
-            p.img_url AS product_img_url,
-            m.nim AS mahasiswa_nim,
-            m.name AS mahasiswa_name,
-            m.tel AS mahasiswa_tel,
-            m.email AS mahasiswa_email,
-            m.address AS mahasiswa_address,
-            m.avatar_url AS mahasiswa_avatar_url,
-            m.pass_hash AS mahasiswa_pass_hash
-        FROM
-            transaction t
-            JOIN "order" o ON t.id = o.transaction_id
-            JOIN product p ON o.product_id = p.id
-            JOIN mahasiswa m ON t.mahasiswa_nim = m.nim
-        ORDER BY transaction_date DESC
-    """
+async def get_all_transactions(
+    nim: int,
+    status: Optional[str] = None,
+    paid: Optional[bool] = None,
+    completed: Optional[bool] = None,
+    date_from: Optional[dt.datetime] = None,
+    date_to: Optional[dt.datetime] = None,
+    student_nim: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+):
+    # keyset pagination over (transaction_date, id), newest first
+    if cursor is None:
+        after_date, after_id = dt.datetime.max, 0
+    else:
+        after_date, after_id = decode_cursor(cursor)
+
+    filters = [
+        pending_expiry_cutoff(),
+        status,
+        paid,
+        completed,
+        jakarta_naive(date_from),
+        jakarta_naive(date_to),
+        student_nim,
+    ]
+
+    # only the requested page of transactions is joined with its orders,
+    # products and student
+    transactions_db = await queries.fetch(
+        "transactions_page",
+        *filters,
+        after_date,
+        after_id,
+        limit,
     )
 
-    transactions_dict = {}
-    for row in transactions_db:
-        transaction_id = row["transaction_id"]
-
-        if transaction_id not in transactions_dict:
-            transactions_dict[transaction_id] = {
-                "mahasiswa": {
-                    "nim": row["mahasiswa_nim"],
-                    "name": row["mahasiswa_name"],
-                    "tel": row["mahasiswa_tel"],
-                    "email": row["mahasiswa_email"],
-                    "address": row["mahasiswa_address"],
-                    "avatar_url": row["mahasiswa_avatar_url"],
-                    "pass_hash": row["mahasiswa_pass_hash"],
-                },
-                "transaction_id": transaction_id,
-                "transaction_date": row["transaction_date"],
-                "paid": row["paid"],
-                "completed": row["completed"],
-                "payment_url": row["payment_url"],
-                "status": row["status"],
-                "orders": [],
-            }
-
-        order = {
-            "id": row["order_id"],
-            "product": {
-                "id": row["product_id"],
-                "name": row["product_name"],
-                "price": row["product_price"],
-                "description": row["product_description"],
-                "img_url": row["product_img_url"],
-            },
-            "quantity": row["quantity"],
-            "size": row["size"],
-            "information": row["information"],
-        }
-        transactions_dict[transaction_id]["orders"].append(order)
-
-    trans_data = []
-    ids_need_to_change = []
-    for trans_data in transactions_dict.values():
-        if trans_data["status"] == "pending" and trans_data[
-            "transaction_date"
-        ] + dt.timedelta(minutes=5) <= dt.datetime.now(
-            pytz.timezone("Asia/Jakarta")
-        ).replace(
-            tzinfo=None
-        ):
-            trans_data["status"] = "expire"
-            ids_need_to_change.append((trans_data["transaction_id"],))
-
-    if ids_need_to_change:
-        await db.pool.executemany(
-            "UPDATE transaction SET status = 'expire' WHERE id = $1", ids_need_to_change
-        )
+    total = None
+    if include_total:
+        total = await queries.fetchval("transactions_count", *filters)
 
-    transactions = []
-    for trans_data in transactions_dict.values():
-        transactions.append(
-            Transaction(
-                id=trans_data["transaction_id"],
-                student=Student(**trans_data["mahasiswa"]),
-                orders=[Order(**order_data) for order_data in trans_data["orders"]],
-                transaction_date=trans_data["transaction_date"],
-                paid=trans_data["paid"],
-                completed=trans_data["completed"],
-                payment_url=trans_data["payment_url"],
-                status=trans_data["status"],
-            )
+    transactions = [
+        Transaction(
+            id=row["id"],
+            student=Student(
+                nim=row["mahasiswa_nim"],
+                name=row["mahasiswa_name"],
+                tel=row["mahasiswa_tel"],
+                email=row["mahasiswa_email"],
+                address=row["mahasiswa_address"],
+                avatar_url=row["mahasiswa_avatar_url"],
+                pass_hash=row["mahasiswa_pass_hash"],
+            ),
+            orders=row["orders"],
+            transaction_date=row["transaction_date"],
+            paid=row["paid"],
+            completed=row["completed"],
+            payment_url=row["payment_url"],
+            status=row["status"],
         )
+        for row in transactions_db
+    ]
+
+    next_cursor = None
+    if len(transactions) == limit:
+        next_cursor = encode_cursor(transactions[-1].transaction_date, transactions[-1].id)
 
     return GetAllTransactionResponse(
         success=True,
         message="Berhasil mengambil semua transaksi mahasiswa",
         transactions=transactions,
+        next_cursor=next_cursor,
+        total=total,
     )
 
 
@@ -143,98 +118,27 @@ async def get_all_transactions(nim: int):
     "/{nim}/transactions", response_model=GetAllStudentTransactionResponse
 )
 async def get_all_student_transactions(nim: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    transactions_db = await db.pool.fetch(
-        """
-        SELECT
-            t.id AS transaction_id,
-            t.transaction_date,
-            t.paid,
-            t.completed,
-            t.payment_url,
-            t.status,
-            o.id AS order_id,
-            o.product_id,
-            o.quantity,
-            o.size,
-            o.information,
-            p.name AS product_name,
-            p.price AS product_price,
-            p.description AS product_description,
-            p.img_url AS product_img_url
-        FROM
-            transaction t
-            JOIN "order" o ON t.id = o.transaction_id
-            JOIN product p ON o.product_id = p.id
-        WHERE
-            t.mahasiswa_nim = $1
-        ORDER BY transaction_date DESC
-    """,
+    transactions_db = await queries.fetch(
+        "student_transactions",
         nim,
+        pending_expiry_cutoff(),
     )
 
-    transactions_dict = {}
-    for row in transactions_db:
-        transaction_id = row["transaction_id"]
-
-        if transaction_id not in transactions_dict:
-            transactions_dict[transaction_id] = {
-                "transaction_id": transaction_id,
-                "transaction_date": row["transaction_date"],
-                "paid": row["paid"],
-                "completed": row["completed"],
-                "payment_url": row["payment_url"],
-                "status": row["status"],
-                "orders": [],
-            }
-
-        order = {
-            "id": row["order_id"],
-            "product": {
-                "id": row["product_id"],
-                "name": row["product_name"],
-                "price": row["product_price"],
-                "description": row["product_description"],
-                "img_url": row["product_img_url"],
-            },
-            "quantity": row["quantity"],
-            "size": row["size"],
-            "information": row["information"],
-        }
-        transactions_dict[transaction_id]["orders"].append(order)
-
-    trans_data = []
-    ids_need_to_change = []
-    for trans_data in transactions_dict.values():
-        if trans_data["status"] == "pending" and trans_data[
-            "transaction_date"
-        ] + dt.timedelta(minutes=5) <= dt.datetime.now(
-            pytz.timezone("Asia/Jakarta")
-        ).replace(
-            tzinfo=None
-        ):
-            trans_data["status"] = "expire"
-            ids_need_to_change.append((trans_data["transaction_id"],))
-
-    if ids_need_to_change:
-        await db.pool.executemany(
-            "UPDATE transaction SET status = 'expire' WHERE id = $1", ids_need_to_change
-        )
-
     transactions = [
         StudentTransaction(
-            id=trans_data["transaction_id"],
-            orders=[Order(**order_data) for order_data in trans_data["orders"]],
-            transaction_date=trans_data["transaction_date"],
-            paid=trans_data["paid"],
-            completed=trans_data["completed"],
-            payment_url=trans_data["payment_url"],
-            status=trans_data["status"],
+            id=row["id"],
+            orders=row["orders"],
+            transaction_date=row["transaction_date"],
+            paid=row["paid"],
+            completed=row["completed"],
+            payment_url=row["payment_url"],
+            status=row["status"],
         )
-        for trans_data in transactions_dict.values()
+        for row in transactions_db
     ]
 
     return GetAllStudentTransactionResponse(
@@ -248,36 +152,14 @@ async def get_all_student_transactions(nim: int):
     "/{nim}/transactions/{transaction_id}", response_model=GetStudentTransactionResponse
 )
 async def get_student_transaction(nim: int, transaction_id: int):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    transaction_db = await db.pool.fetch(
-        """
-        SELECT
-            t.id AS transaction_id,
-            t.transaction_date,
-            t.paid,
-            t.completed,
-            t.payment_url,
-            t.status,
-            o.id AS order_id,
-            o.product_id,
-            o.quantity,
-            o.size,
-            o.information,
-            p.name AS product_name,
-            p.price AS product_price,
-            p.description AS product_description,
-            p.img_url AS product_img_url
-        FROM
-            transaction t
-            JOIN "order" o ON t.id = o.transaction_id
-            JOIN product p ON o.product_id = p.id
-        WHERE
-            t.id = $1
-    """,
+    transaction_db = await queries.fetchrow(
+        "student_transaction",
         transaction_id,
+        pending_expiry_cutoff(),
     )
 
     if not transaction_db:
@@ -285,41 +167,15 @@ async def get_student_transaction(nim: int, transaction_id: int):
             404, f"Transaksi dengan id {transaction_id} tidak ditemukan"
         )
 
-    transaction_data = {
-        "transaction_id": transaction_id,
-        "transaction_date": transaction_db[0]["transaction_date"],
-        "paid": transaction_db[0]["paid"],
-        "completed": transaction_db[0]["completed"],
-        "payment_url": transaction_db[0]["payment_url"],
-        "status": transaction_db[0]["status"],
-        "orders": [],
-    }
-
-    for row in transaction_db:
-        order = {
-            "id": row["order_id"],
-            "product": {
-                "id": row["product_id"],
-                "name": row["product_name"],
-                "price": row["product_price"],
-                "description": row["product_description"],
-                "img_url": row["product_img_url"],
-            },
-            "quantity": row["quantity"],
-            "size": row["size"],
-            "information": row["information"],
-        }
-        transaction_data["orders"].append(order)
-
     transaction = Transaction(
-        id=transaction_data["transaction_id"],
+        id=transaction_db["id"],
         student=Student(**student),
-        orders=[Order(**order_data) for order_data in transaction_data["orders"]],
-        transaction_date=transaction_data["transaction_date"],
-        paid=transaction_data["paid"],
-        completed=transaction_data["completed"],
-        payment_url=transaction_data["payment_url"],
-        status=transaction_data["status"],
+        orders=transaction_db["orders"],
+        transaction_date=transaction_db["transaction_date"],
+        paid=transaction_db["paid"],
+        completed=transaction_db["completed"],
+        payment_url=transaction_db["payment_url"],
+        status=transaction_db["status"],
     )
 
     return GetStudentTransactionResponse(
@@ -331,46 +187,22 @@ async def get_student_transaction(nim: int, transaction_id: int):
 
 @transaction_router.post("/{nim}/transactions", response_model=AddTransactionResponse)
 async def add_student_transaction(nim: int, cart_ids: List[int]):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    cart_details = await db.pool.fetch(
-        """
-        SELECT
-            c.id AS cart_id,
-            c.product_id,
-            c.quantity,
-            c.size,
-            c.information,
-            p.name,
-            p.img_url,
-            p.price
-        FROM
-            cart c
-        INNER JOIN
-            product p ON c.product_id = p.id
-        WHERE
-            c.id = ANY($1)
-        """,
-        cart_ids,
-    )
-
-    transaction_id = await db.pool.fetchval(
-        """
-        INSERT INTO transaction (
-            mahasiswa_nim,
-            transaction_date,
-            paid,
-            completed,
-            status
-        )
-        VALUES ($1, $2, false, false, 'pending')
-        RETURNING id
-        """,
+    # one round trip before Midtrans and one after, no transaction held open
+    # across the Midtrans call
+    cart_details = await queries.fetch(
+        "checkout_prepare",
         nim,
         dt.datetime.now(pytz.timezone("Asia/Jakarta")).replace(tzinfo=None),
+        cart_ids,
     )
+    if not cart_details:
+        raise HTTPException(404, f"Cart dengan id {cart_ids} tidak ditemukan")
+
+    transaction_id = cart_details[0]["transaction_id"]
 
     item_details = [
         {
@@ -416,39 +248,31 @@ async def add_student_transaction(nim: int, cart_ids: List[int]):
         # "enabled_payments": ["credit_card", "gopay", "shopeepay", "other_qris"],
     }
 
+    # the carts already moved into this transaction's orders, so any failure
+    # puts them back, cancellation (shutdown, timeouts) included; the writes
+    # are shielded so a cancelled request still completes them
     try:
         redirect_url = await create_transaction(midtrans_payload)
-    except Exception as e:
-        await db.pool.execute("DELETE FROM transaction WHERE id = $1", transaction_id)
-        return HTTPException(status_code=400, detail=str(e))
-
-    await db.pool.execute(
-        "UPDATE transaction SET payment_url = $1 WHERE id = $2",
-        redirect_url,
-        transaction_id,
-    )
-
-    await db.pool.executemany(
-        """
-        INSERT INTO \"order\" (
-            mahasiswa_nim, product_id, quantity, size, information, transaction_id)
-        VALUES
-            ($1, $2, $3, $4, $5, $6)
-        """,
-        [
-            (
-                student["nim"],
-                cart["product_id"],
-                cart["quantity"],
-                cart["size"],
-                cart["information"],
+    except BaseException as e:
+        await asyncio.shield(
+            queries.execute(
+                "checkout_cancel",
                 transaction_id,
+                nim,
+                [cart["cart_id"] for cart in cart_details],
+                [cart["product_id"] for cart in cart_details],
+                [cart["quantity"] for cart in cart_details],
+                [cart["size"] for cart in cart_details],
+                [cart["information"] for cart in cart_details],
             )
-            for cart in cart_details
-        ],
-    )
+        )
+        if isinstance(e, Exception):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
 
-    await db.pool.execute("DELETE FROM cart WHERE id = ANY($1)", cart_ids)
+    await asyncio.shield(
+        queries.execute("checkout_finish", redirect_url, transaction_id)
+    )
 
     return AddTransactionResponse(
         success=True,
@@ -465,25 +289,21 @@ async def update_student_transaction(
     completed: Optional[bool] = None,
     status: Optional[str] = None,
 ):
-    student = await db.pool.fetchrow("SELECT * FROM mahasiswa WHERE nim = $1", nim)
+    student = await student_cache.get(nim)
     if not student:
         raise HTTPException(404, f"Mahasiswa dengan nim {nim} tidak ditemukan")
 
-    transaction = await db.pool.fetchrow(
-        "SELECT * FROM transaction WHERE id = $1", transaction_id
-    )
-    if not transaction:
-        return HTTPException(
-            404, f"Transaksi dengan id {transaction_id} tidak ditemukan"
-        )
-
-    await db.pool.execute(
-        "UPDATE transaction SET paid = COALESCE($1, paid), completed = COALESCE($2, completed), status = COALESCE($3, status) WHERE id = $4",
+    updated = await db.pool.fetchval(
+        "UPDATE transaction SET paid = COALESCE($1, paid), completed = COALESCE($2, completed), status = COALESCE($3, status) WHERE id = $4 RETURNING id",
         paid,
         completed,
         status,
         transaction_id,
     )
+    if updated is None:
+        raise HTTPException(
+            404, f"Transaksi dengan id {transaction_id} tidak ditemukan"
+        )
 
     return Response(
         success=True, message=f"Berhasil menyunting transaksi {transaction_id}"
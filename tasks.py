@@ -0,0 +1,125 @@
+import asyncio
+import os
+
+from util import db, pending_expiry_cutoff
+
+
+class TransactionSweeper:
+    """Periodically marks stale pending transactions as expired, in batches.
+
+    Pending transactions that never got a payment_url are checkouts whose
+    worker died between checkout_prepare and checkout_finish; their orders go
+    back into the cart and the transaction is deleted instead.
+    """
+
+    def __init__(self, interval=30.0, batch_size=500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.expired = 0
+        self.restored = 0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sweep(self):
+        cutoff = pending_expiry_cutoff()
+        await self.restore_orphans(cutoff)
+
+        expired = 0
+        while True:
+            # SKIP LOCKED lets sweepers in other workers run side by side
+            status = await db.pool.execute(
+                """
+                UPDATE transaction SET status = 'expire'
+                WHERE id IN (
+                    SELECT id FROM transaction
+                    WHERE
+                        status = 'pending'
+                        AND transaction_date <= $1
+                        AND payment_url IS NOT NULL
+                    ORDER BY transaction_date
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                cutoff,
+                self.batch_size,
+            )
+            count = int(status.split()[-1])
+            expired += count
+            if count < self.batch_size:
+                break
+
+        self.expired += expired
+        return expired
+
+    async def restore_orphans(self, cutoff):
+        restored = 0
+        while True:
+            count = await db.pool.fetchval(
+                """
+                WITH orphans AS (
+                    SELECT id FROM transaction
+                    WHERE
+                        status = 'pending'
+                        AND transaction_date <= $1
+                        AND payment_url IS NULL
+                    ORDER BY transaction_date
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ),
+                orders AS (
+                    DELETE FROM "order" o
+                    USING orphans
+                    WHERE o.transaction_id = orphans.id
+                    RETURNING o.mahasiswa_nim, o.product_id, o.quantity, o.size, o.information
+                ),
+                removed AS (
+                    DELETE FROM transaction t
+                    USING orphans
+                    WHERE t.id = orphans.id
+                    RETURNING t.id
+                ),
+                carts AS (
+                    INSERT INTO cart (mahasiswa_nim, product_id, quantity, size, information)
+                    SELECT mahasiswa_nim, product_id, quantity, size, information FROM orders
+                )
+                SELECT COUNT(*) FROM removed
+                """,
+                cutoff,
+                self.batch_size,
+            )
+            restored += count
+            if count < self.batch_size:
+                break
+
+        self.restored += restored
+        return restored
+
+    async def _run(self):
+        while True:
+            try:
+                restored = self.restored
+                expired = await self.sweep()
+                if self.restored > restored:
+                    print(
+                        f"Returned {self.restored - restored} unfinished checkouts to the cart"
+                    )
+                if expired:
+                    print(f"Expired {expired} pending transactions")
+            except Exception as e:
+                print(f"transaction sweeper error: {e!r}")
+            await asyncio.sleep(self.interval)
+
+
+transaction_sweeper = TransactionSweeper(
+    interval=float(os.getenv("TRANSACTION_SWEEP_INTERVAL", 30)),
+    batch_size=int(os.getenv("TRANSACTION_SWEEP_BATCH_SIZE", 500)),
+)
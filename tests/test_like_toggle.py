@@ -0,0 +1,129 @@
+"""Concurrent like toggles by the same students on one post.
+
+Needs a disposable PostgreSQL database given as an asyncpg DSN in
+TEST_DATABASE_URL; the test works in its own schema and drops it afterwards.
+
+    TEST_DATABASE_URL=postgresql://postgres@127.0.0.1:55432/dbg python -m unittest tests.test_like_toggle
+"""
+import asyncio
+import glob
+import os
+import random
+import unittest
+from collections import Counter
+
+import asyncpg
+
+import queries
+from cache import liked_posts
+from routes.route_post import toggle_post_like
+from util import LazyConnection, Pool, db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSN = os.getenv("TEST_DATABASE_URL")
+SCHEMA = "test_like_toggle"
+POST = 1
+STUDENTS = [1301190001, 1301190002, 1301190003]
+
+
+@unittest.skipUnless(DSN, "TEST_DATABASE_URL is not set")
+class LikeToggleTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.con = await asyncpg.connect(DSN)
+        await self.con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await self.con.execute(f"CREATE SCHEMA {SCHEMA}")
+        await self.con.execute(f"SET search_path TO {SCHEMA}")
+        with open(os.path.join(ROOT, "bench", "schema.sql")) as f:
+            await self.con.execute(f.read())
+        for path in sorted(glob.glob(os.path.join(ROOT, "migrations", "*.sql"))):
+            with open(path) as f:
+                await self.con.execute(f.read())
+        await self.con.executemany(
+            """
+            INSERT INTO mahasiswa (nim, name, tel, email, avatar_url, address, pass_hash)
+            VALUES ($1, 'Mahasiswa', 0, $2, '', '', '')
+            """,
+            [(nim, f"{nim}@student.example") for nim in STUDENTS],
+        )
+        await self.con.execute(
+            """
+            INSERT INTO post (id, poster_id, post_date, content, can_comment)
+            VALUES ($1, $2, now(), 'Like storm', true)
+            """,
+            POST,
+            STUDENTS[0],
+        )
+
+        self.saved_pool = db.pool
+        db.pool = Pool(
+            await asyncpg.create_pool(
+                DSN,
+                min_size=10,
+                max_size=10,
+                server_settings={"search_path": SCHEMA},
+                init=db.init_connection,
+            )
+        )
+        for nim in STUDENTS:
+            liked_posts.forget(nim)
+
+    async def asyncTearDown(self):
+        await db.pool.close()
+        db.pool = self.saved_pool
+        for nim in STUDENTS:
+            liked_posts.forget(nim)
+        await self.con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await self.con.close()
+
+    async def test_concurrent_toggles_alternate(self):
+        rng = random.Random(0)
+        plan = [rng.choice(STUDENTS) for _ in range(300)]
+
+        responses = await asyncio.gather(*(toggle(POST, nim) for nim in plan))
+
+        toggles = Counter(plan)
+        liked_responses = Counter(
+            nim for nim, resp in zip(plan, responses) if resp.is_liked
+        )
+        likers = {
+            row["liker_id"]
+            for row in await self.con.fetch(
+                'SELECT liker_id FROM "like" WHERE post_id = $1', POST
+            )
+        }
+        for nim in STUDENTS:
+            with self.subTest(nim=nim):
+                # starting unliked, every toggle flips: odd counts end liked,
+                # and the responses alternate between liked and unliked
+                self.assertEqual(nim in likers, toggles[nim] % 2 == 1)
+                self.assertEqual(liked_responses[nim], (toggles[nim] + 1) // 2)
+                self.assertEqual(POST in await liked_posts.get(nim), nim in likers)
+
+        like_count = await self.con.fetchval(
+            "SELECT like_count FROM post WHERE id = $1", POST
+        )
+        self.assertEqual(like_count, len(likers))
+
+    async def test_missing_post_or_student(self):
+        result = await queries.fetchrow("post_like_toggle", POST + 1, STUDENTS[0])
+        self.assertFalse(result["post_exists"])
+        result = await queries.fetchrow("post_like_toggle", POST, 1)
+        self.assertTrue(result["post_exists"])
+        self.assertFalse(result["user_exists"])
+        self.assertFalse(result["is_liked"])
+
+
+async def toggle(post_id, user_id):
+    # what the db_connection dependency does around the route
+    con = LazyConnection(db.pool, transactional=True)
+    try:
+        result = await toggle_post_like(post_id, user_id, con=con)
+    except BaseException as exc:
+        await con.close(exc)
+        raise
+    await con.close()
+    return result
+
+
+if __name__ == "__main__":
+    unittest.main()
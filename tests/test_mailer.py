@@ -0,0 +1,121 @@
+"""EmailOutbox delivering to a local aiosmtpd server.
+
+    python -m unittest tests.test_mailer
+"""
+import asyncio
+import socket
+import time
+import unittest
+
+from aiosmtpd.controller import Controller
+
+from mailer import EmailOutbox
+
+SENDER = "noreply@myhmtk.example"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Recorder:
+    """Keeps every accepted message with the connection it came in on and
+    answers 451 to the first ``refuse`` DATA commands."""
+
+    def __init__(self, refuse=0):
+        self.refuse = refuse
+        self.attempts = []
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.attempts.append(time.monotonic())
+        if self.refuse:
+            self.refuse -= 1
+            return "451 Try again later"
+        self.received.append((session.peer, envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+def message(n):
+    return f"Subject: test {n}\r\n\r\nbody {n}\r\n"
+
+
+class EmailOutboxTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.port = free_port()
+        self.controllers = []
+
+    async def asyncTearDown(self):
+        await self.outbox.close(drain_timeout=1)
+        for controller in self.controllers:
+            controller.stop()
+
+    def serve(self, handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=self.port)
+        controller.start()
+        self.controllers.append(controller)
+
+    async def wait_for(self, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out waiting for the outbox")
+            await asyncio.sleep(0.01)
+
+    async def test_batch_is_delivered_over_one_connection(self):
+        recorder = Recorder()
+        self.serve(recorder)
+        self.outbox = EmailOutbox(
+            host="127.0.0.1", port=self.port, workers=1, batch_size=10, backoff=0.1
+        )
+        # queued before the worker starts, so it takes them as one batch
+        for n in range(10):
+            self.outbox.enqueue(SENDER, [f"student{n}@myhmtk.example"], message(n))
+        await self.outbox.start()
+
+        await self.wait_for(lambda: len(recorder.received) == 10)
+        self.assertEqual(
+            [rcpt_tos for _, rcpt_tos, _ in recorder.received],
+            [[f"student{n}@myhmtk.example"] for n in range(10)],
+        )
+        self.assertIn(b"body 3", recorder.received[3][2])
+        self.assertEqual(len({peer for peer, _, _ in recorder.received}), 1)
+        self.assertEqual((self.outbox.sent, self.outbox.failed), (10, 0))
+
+    async def test_refused_message_is_retried_after_backoff(self):
+        recorder = Recorder(refuse=1)
+        self.serve(recorder)
+        self.outbox = EmailOutbox(
+            host="127.0.0.1", port=self.port, workers=1, backoff=0.3
+        )
+        await self.outbox.start()
+        self.outbox.enqueue(SENDER, ["student@myhmtk.example"], message(0))
+
+        await self.wait_for(lambda: len(recorder.received) == 1)
+        first, second = recorder.attempts
+        self.assertGreaterEqual(second - first, 0.3)
+        self.assertEqual((self.outbox.sent, self.outbox.failed), (1, 0))
+
+    async def test_refused_connection_is_retried_after_backoff(self):
+        self.outbox = EmailOutbox(
+            host="127.0.0.1", port=self.port, workers=1, backoff=0.3
+        )
+        await self.outbox.start()
+        enqueued = time.monotonic()
+        self.outbox.enqueue(SENDER, ["student@myhmtk.example"], message(0))
+
+        # nothing listens yet, so the first attempt fails and waits out its
+        # backoff before the server comes up
+        await self.wait_for(lambda: self.outbox._retries)
+        recorder = Recorder()
+        self.serve(recorder)
+
+        await self.wait_for(lambda: len(recorder.received) == 1)
+        self.assertGreaterEqual(recorder.attempts[0] - enqueued, 0.3)
+        self.assertEqual((self.outbox.sent, self.outbox.failed), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
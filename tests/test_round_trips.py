@@ -0,0 +1,159 @@
+"""Write endpoints that are meant to cost a single database round trip.
+
+Each handler is called inside its own tracing.RequestTrace, which counts the
+statements sent through the pool the same way QueryTraceMiddleware does for a
+request, once for a row that exists and once for one that does not.
+
+Needs a disposable PostgreSQL database given as an asyncpg DSN in
+TEST_DATABASE_URL; the test works in its own schema and drops it afterwards.
+
+    TEST_DATABASE_URL=postgresql://postgres@127.0.0.1:55432/dbg python -m unittest tests.test_round_trips
+"""
+import datetime as dt
+import glob
+import os
+import unittest
+
+import asyncpg
+from fastapi import HTTPException
+
+import tracing
+from cache import product_cache, student_cache
+from routes.route_activity import delete_activity, update_activity
+from routes.route_cart import delete_student_cart, update_student_cart
+from routes.route_fun_tk import delete_fun_tk
+from routes.route_lab_post import delete_lab_post
+from routes.route_post import add_comment, delete_comment, delete_post, update_post
+from routes.route_product import delete_product, update_product
+from util import Pool, db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSN = os.getenv("TEST_DATABASE_URL")
+SCHEMA = "test_round_trips"
+NIM = 1301190001
+MISSING = 999999
+
+
+@unittest.skipUnless(DSN, "TEST_DATABASE_URL is not set")
+class SingleStatementTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.con = await asyncpg.connect(DSN)
+        await self.con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await self.con.execute(f"CREATE SCHEMA {SCHEMA}")
+        await self.con.execute(f"SET search_path TO {SCHEMA}")
+        with open(os.path.join(ROOT, "bench", "schema.sql")) as f:
+            await self.con.execute(f.read())
+        for path in sorted(glob.glob(os.path.join(ROOT, "migrations", "*.sql"))):
+            with open(path) as f:
+                await self.con.execute(f.read())
+        # a fresh schema, so every serial id starts at 1
+        await self.con.execute(
+            """
+            INSERT INTO mahasiswa (nim, name, tel, email, avatar_url, address, pass_hash)
+            VALUES ($1, 'Mahasiswa', 0, 'mahasiswa@student.example', '', '', '');
+            INSERT INTO post (poster_id, post_date, content, can_comment)
+            VALUES ($1, now(), 'Post', true), ($1, now(), 'Post', true);
+            INSERT INTO comment (post_id, commenter_id, comment_date, content)
+            VALUES (1, $1, now(), 'Comment');
+            INSERT INTO product (name, price, description, img_url)
+            VALUES ('Kaos', 100000, '', ''), ('Jaket', 200000, '', '');
+            INSERT INTO cart (mahasiswa_nim, product_id, quantity, size)
+            VALUES ($1, 1, 1, 'm'), ($1, 1, 1, 'l');
+            INSERT INTO activity (post_date, title, content, img_url)
+            VALUES (now(), 'Activity', '', ''), (now(), 'Activity', '', '');
+            INSERT INTO fun_tk (post_date, title, description, img_url, date, time, location)
+            VALUES (now(), 'Fun TK', '', '', current_date, '10:00', '');
+            INSERT INTO lab_post (post_date, lab, content)
+            VALUES (now(), 'sea', 'Lab post');
+            """.replace("$1", str(NIM))
+        )
+
+        self.saved_pool = db.pool
+        db.pool = Pool(
+            await asyncpg.create_pool(
+                DSN,
+                min_size=2,
+                max_size=2,
+                server_settings={"search_path": SCHEMA},
+                init=db.init_connection,
+            )
+        )
+        for nim in [NIM, MISSING]:
+            student_cache.invalidate(nim)
+        for product_id in [1, 2, MISSING]:
+            product_cache.invalidate(product_id)
+
+    async def asyncTearDown(self):
+        await db.pool.close()
+        db.pool = self.saved_pool
+        for nim in [NIM, MISSING]:
+            student_cache.invalidate(nim)
+        for product_id in [1, 2, MISSING]:
+            product_cache.invalidate(product_id)
+        await self.con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await self.con.close()
+
+    async def round_trips(self, handler, *args, **kwargs):
+        # the student lookup the cart handlers start with is served from
+        # student_cache in steady state, so it is loaded outside the trace
+        await student_cache.get(NIM)
+
+        trace = tracing.RequestTrace(handler.__name__)
+        token = tracing.current.set(trace)
+        try:
+            await handler(*args, **kwargs)
+            status = 200
+        except HTTPException as e:
+            status = e.status_code
+        finally:
+            tracing.current.reset(token)
+        return trace.statements, status
+
+    async def assertOneRoundTrip(self, handler, *args, status=200, **kwargs):
+        self.assertEqual(
+            await self.round_trips(handler, *args, **kwargs),
+            (1, status),
+            f"{handler.__name__}{args}",
+        )
+
+    async def test_posts(self):
+        await self.assertOneRoundTrip(update_post, 1, content="Sunting")
+        await self.assertOneRoundTrip(update_post, MISSING, content="x", status=404)
+        await self.assertOneRoundTrip(delete_post, 2)
+        await self.assertOneRoundTrip(delete_post, MISSING, status=404)
+
+    async def test_comments(self):
+        now = dt.datetime.now()
+        await self.assertOneRoundTrip(add_comment, 1, NIM, now, "Komentar")
+        await self.assertOneRoundTrip(add_comment, MISSING, NIM, now, "x", status=404)
+        await self.assertOneRoundTrip(delete_comment, 1, 1)
+        await self.assertOneRoundTrip(delete_comment, 1, MISSING, status=404)
+        await self.assertOneRoundTrip(delete_comment, MISSING, 1, status=404)
+
+    async def test_carts(self):
+        await self.assertOneRoundTrip(update_student_cart, NIM, 1, quantity=3)
+        await self.assertOneRoundTrip(
+            update_student_cart, NIM, MISSING, quantity=3, status=404
+        )
+        await self.assertOneRoundTrip(delete_student_cart, NIM, 2)
+        await self.assertOneRoundTrip(delete_student_cart, NIM, MISSING, status=404)
+
+    async def test_products(self):
+        await self.assertOneRoundTrip(update_product, 1, price=120000)
+        await self.assertOneRoundTrip(update_product, MISSING, price=1, status=404)
+        await self.assertOneRoundTrip(delete_product, 2)
+        await self.assertOneRoundTrip(delete_product, MISSING, status=404)
+
+    async def test_activities_fun_tk_and_lab_posts(self):
+        await self.assertOneRoundTrip(update_activity, 1, title="Sunting")
+        await self.assertOneRoundTrip(update_activity, MISSING, title="x", status=404)
+        await self.assertOneRoundTrip(delete_activity, 2)
+        await self.assertOneRoundTrip(delete_activity, MISSING, status=404)
+        await self.assertOneRoundTrip(delete_fun_tk, 1)
+        await self.assertOneRoundTrip(delete_fun_tk, MISSING, status=404)
+        await self.assertOneRoundTrip(delete_lab_post, 1)
+        await self.assertOneRoundTrip(delete_lab_post, MISSING, status=404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import re
+import functools
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+from metrics import Counter, LabeledHistogram
+
+load_dotenv()
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# a request running one statement shape more often than this is likely N+1
+QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", 5))
+QUERY_ROUND_TRIP_BUDGET = int(os.getenv("QUERY_ROUND_TRIP_BUDGET", 10))
+
+statements_per_request = LabeledHistogram(
+    "myhmtk_db_statements_per_request",
+    "Database round trips made while handling one request.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+budget_exceeded = Counter(
+    "myhmtk_db_query_budget_exceeded_total",
+    "Requests over the round trip budget or repeating a statement shape.",
+    ("method", "route", "kind"),
+)
+
+_literals = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+(?:\.\d+)?\b")
+_whitespace = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def shape(query):
+    """Query text with literals replaced and whitespace collapsed."""
+    return _whitespace.sub(" ", _literals.sub("?", query)).strip()
+
+
+class RequestTrace:
+    __slots__ = ("path", "statements", "rows", "shapes")
+
+    def __init__(self, path):
+        self.path = path
+        self.statements = 0
+        self.rows = 0
+        self.shapes = {}
+
+    def finish(self, method, route):
+        statements_per_request.labels(method, route).observe(self.statements)
+
+        if self.statements > QUERY_ROUND_TRIP_BUDGET:
+            budget_exceeded.labels(method, route, "round_trips").inc()
+            print(
+                f"query budget: {method} {route} made {self.statements} round trips"
+                f" (budget {QUERY_ROUND_TRIP_BUDGET}) for {self.path}"
+            )
+
+        for query_shape, count in self.shapes.items():
+            if count > QUERY_REPEAT_LIMIT:
+                budget_exceeded.labels(method, route, "repeated").inc()
+                print(
+                    f"query budget: {method} {route} ran the same statement"
+                    f" {count} times for {self.path}: {query_shape[:200]}"
+                )
+
+
+current = ContextVar("request_trace", default=None)
+
+
+def record(query, elapsed, rows, executions=1):
+    """Account one round trip to the request being handled, if any.
+
+    ``executions`` is how many times the server ran the statement in that
+    round trip, executemany sends one per argument tuple.
+    """
+    trace = current.get()
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        path = trace.path if trace is not None else "-"
+        print(
+            f"slow query: {elapsed * 1000:.1f} ms, {rows} rows, {path}:"
+            f" {shape(query)[:500]}"
+        )
+
+    if trace is not None:
+        trace.statements += 1
+        trace.rows += rows
+        query_shape = shape(query)
+        trace.shapes[query_shape] = trace.shapes.get(query_shape, 0) + executions
+
+
+class QueryTraceMiddleware:
+    """Collects the statements each request runs and checks them against
+    the round trip budget and the repeated statement limit."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace(scope["path"])
+        token = current.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            trace.finish(scope["method"], route)
@@ -1,9 +1,16 @@
-import midtransclient
-import smtplib
 import asyncpg
+import asyncio
 import hashlib
+import base64
+import json
 import jwt
 import os
+import orjson
+import pytz
+import time
+import datetime as dt
+import functools
+import contextlib
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,22 +18,23 @@ load_dotenv()
 
 SECRET = os.getenv("SECRET")
 
-from fastapi import Request
+from fastapi.routing import APIRoute
 from fastapi.security import HTTPBearer
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import request_response
+from pydantic import BaseModel
 from fastapi.security.utils import get_authorization_scheme_param
 
+from midtrans import snap
+from mailer import outbox
+from metrics import Histogram, add_time, requests_in_flight
+import tracing
+
 bearer_scheme = HTTPBearer()
 SECRET_KEY = os.getenv("SECRET_KEY")
 
-snap_api = midtransclient.Snap(
-    is_production=False,
-    server_key=os.getenv("MIDTRANS_SERVER_KEY"),
-    client_key=os.getenv("MIDTRANS_CLIENT_KEY"),
-)
-
 
 # class DBSession:
 #     def __init__(self):
@@ -45,64 +53,466 @@ snap_api = midtransclient.Snap(
 #         await self.db.close()
 
 
+async def init_connection(con):
+    # json_agg / json_build_object columns come back as python objects
+    for type_name in ["json", "jsonb"]:
+        await con.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+class Pool:
+    """asyncpg pool wrapper that records how long callers wait for a connection.
+
+    Query shortcuts go through ``acquire`` so they are measured too, anything
+    else is passed through to the asyncpg pool. Acquired connections are
+    handed out as ``TracedConnection`` so every statement is accounted to the
+    current request.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.acquire_wait = Histogram()
+        self.waiting = 0
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    def acquire(self, *, timeout=None):
+        return _AcquireContext(self, timeout)
+
+    async def fetch(self, query, *args, timeout=None):
+        async with self.acquire() as con:
+            return await con.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query, *args, timeout=None):
+        async with self.acquire() as con:
+            return await con.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        async with self.acquire() as con:
+            return await con.fetchval(query, *args, column=column, timeout=timeout)
+
+    async def execute(self, query, *args, timeout=None):
+        async with self.acquire() as con:
+            return await con.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command, args, *, timeout=None):
+        async with self.acquire() as con:
+            return await con.executemany(command, args, timeout=timeout)
+
+    async def copy_from_query(self, query, *args, **kwargs):
+        async with self.acquire() as con:
+            return await con.copy_from_query(query, *args, **kwargs)
+
+    async def _acquire(self, timeout):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            return await self._pool.acquire(timeout=timeout)
+        finally:
+            self.waiting -= 1
+            self.acquire_wait.observe(time.perf_counter() - start)
+
+
+class _AcquireContext:
+    __slots__ = ("pool", "timeout", "con", "start")
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.con = None
+        self.start = None
+
+    async def __aenter__(self):
+        self.start = time.perf_counter()
+        self.con = await self.pool._acquire(self.timeout)
+        return TracedConnection(self.con)
+
+    async def __aexit__(self, *exc):
+        con, self.con = self.con, None
+        try:
+            await self.pool._pool.release(con)
+        finally:
+            # waiting for and holding the connection both count as db time
+            add_time("db", time.perf_counter() - self.start)
+
+
+def _status_rows(status):
+    # "INSERT 0 3", "UPDATE 2", "COPY 10"; BEGIN and friends carry no count
+    count = status.rpartition(" ")[2] if status else ""
+    return int(count) if count.isdigit() else 0
+
+
+class TracedConnection:
+    """Pooled connection proxy timing each statement for ``tracing``.
+
+    Only statements issued by the app are seen; asyncpg's own introspection
+    and the reset query on release go to the wrapped connection directly.
+    """
+
+    __slots__ = ("_con",)
+
+    def __init__(self, con):
+        self._con = con
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    async def fetch(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = await self._con.fetch(query, *args, **kwargs)
+            return rows
+        finally:
+            tracing.record(query, time.perf_counter() - start, len(rows))
+
+    async def fetchrow(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        row = None
+        try:
+            row = await self._con.fetchrow(query, *args, **kwargs)
+            return row
+        finally:
+            tracing.record(query, time.perf_counter() - start, int(row is not None))
+
+    async def fetchval(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        value = None
+        try:
+            value = await self._con.fetchval(query, *args, **kwargs)
+            return value
+        finally:
+            tracing.record(query, time.perf_counter() - start, int(value is not None))
+
+    async def execute(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            status = await self._con.execute(query, *args, **kwargs)
+            return status
+        finally:
+            tracing.record(query, time.perf_counter() - start, _status_rows(status))
+
+    async def executemany(self, command, args, **kwargs):
+        start = time.perf_counter()
+        done = False
+        try:
+            result = await self._con.executemany(command, args, **kwargs)
+            done = True
+            return result
+        finally:
+            rows = len(args) if done and hasattr(args, "__len__") else 0
+            tracing.record(command, time.perf_counter() - start, rows, rows)
+
+    async def copy_from_query(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            status = await self._con.copy_from_query(query, *args, **kwargs)
+            return status
+        finally:
+            tracing.record(query, time.perf_counter() - start, _status_rows(status))
+
+
 class Database:
+    def __init__(self):
+        self.pool = None
+        # run on every new pooled connection, modules register their own
+        self.init_hooks = [init_connection]
+        self.connections_opened = 0
+
     async def create_pool(self):
-        self.pool = await asyncpg.create_pool(
+        command_timeout = os.getenv("DB_COMMAND_TIMEOUT")
+        pool = await asyncpg.create_pool(
             host=os.getenv("DBHOST"),
             database=os.getenv("DBNAME"),
             user=os.getenv("DBUSER"),
             password=os.getenv("DBPASS"),
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", 10)),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            max_inactive_connection_lifetime=float(
+                os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", 300)
+            ),
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100)),
+            command_timeout=float(command_timeout) if command_timeout else None,
+            init=self.init_connection,
         )
+        self.pool = Pool(pool)
+
+    async def init_connection(self, con):
+        self.connections_opened += 1
+        for hook in self.init_hooks:
+            await hook(con)
+
+    def pool_stats(self):
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.pool.waiting,
+            # every connection the pool ever opened went through init, the
+            # ones no longer counted in its size were closed (idle lifetime,
+            # broken, or replaced)
+            "connections_opened": self.connections_opened,
+            "connections_closed": self.connections_opened - size,
+            "acquire_wait": self.pool.acquire_wait.stats(),
+        }
 
 
 db = Database()
 
 
-class MyHMTKMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, **options):
-        self.fastapi_app = options["fastapi_app"]
-        super().__init__(app)
+class LazyConnection:
+    """One pool connection for a whole request, acquired on first use.
+
+    With ``transactional`` the first use also starts a transaction, committed
+    by ``close`` or rolled back when the request failed. ``release`` hands
+    the connection back early (before slow non-database work), committing
+    first; the next statement acquires again.
+    """
+
+    __slots__ = ("pool", "transactional", "_acquire", "_con", "_tx")
+
+    def __init__(self, pool, transactional=False):
+        self.pool = pool
+        self.transactional = transactional
+        self._acquire = None
+        self._con = None
+        self._tx = None
+
+    async def connection(self):
+        if self._con is None:
+            self._acquire = self.pool.acquire()
+            self._con = await self._acquire.__aenter__()
+            if self.transactional:
+                self._tx = self._con.transaction()
+                try:
+                    await self._tx.start()
+                except BaseException:
+                    await self._close(None)
+                    raise
+        return self._con
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        # a savepoint when the request already runs in a transaction
+        con = await self.connection()
+        async with con.transaction():
+            yield self
+
+    async def fetch(self, query, *args, **kwargs):
+        return await (await self.connection()).fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await (await self.connection()).fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await (await self.connection()).fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        return await (await self.connection()).execute(query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        return await (await self.connection()).executemany(command, args, **kwargs)
+
+    async def release(self):
+        await self.close()
+
+    async def close(self, exc=None):
+        if self._con is None:
+            return
+        try:
+            if self._tx is not None:
+                if exc is None:
+                    await self._tx.commit()
+                else:
+                    await self._tx.rollback()
+        finally:
+            await self._close(exc)
+
+    async def _close(self, exc):
+        acquire, self._acquire, self._con, self._tx = self._acquire, None, None, None
+        await acquire.__aexit__(type(exc) if exc else None, exc, None)
+
+
+def db_connection(transaction=False):
+    """Dependency yielding a ``LazyConnection`` held until the response is sent.
+
+    Work left uncommitted at that point is committed after the response went
+    out, so handlers whose response depends on the commit call ``release``
+    before returning.
+    """
+
+    async def dependency():
+        con = LazyConnection(db.pool, transaction)
+        try:
+            yield con
+        except BaseException as exc:
+            await con.close(exc)
+            raise
+        await con.close()
+
+    return dependency
+
+
+async def stream_copy(query, *args, chunk_queue_size=16):
+    # COPY ... TO STDOUT into an async generator; the bounded queue stalls
+    # COPY while the client is slower than postgres, so memory stays flat
+    queue = asyncio.Queue(maxsize=chunk_queue_size)
+
+    async def put(data):
+        # asyncpg hands out bytearray chunks, which StreamingResponse does
+        # not accept
+        await queue.put(bytes(data))
+
+    async def copy():
+        try:
+            async with db.pool.acquire() as con:
+                await con.copy_from_query(
+                    query, *args, output=put, format="csv", header=True
+                )
+        except Exception as exc:
+            # raised by the consumer, so a COPY failing mid-stream aborts the
+            # response instead of ending it as a truncated but complete CSV
+            await queue.put(exc)
+        else:
+            await queue.put(None)
+
+    task = asyncio.create_task(copy())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        # the client went away or the COPY failed; wait for the producer to
+        # unwind so its connection is back in the pool
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# paths served without the bearer secret
+PUBLIC_PREFIXES = (
+    "/docs",
+    "/metrics",
+    "/openapi.json",
+    "/reset_password",
+    "/transaction/midtrans_callback",
+    "/transaction/success",
+    "/transaction/pending",
+    "/transaction/midtrans_notification",
+)
 
-    async def dispatch(self, request: Request, call_next):
-        if self.need_auth(request.url.path):
-            authorization = request.headers.get("Authorization")
-            scheme, credentials = get_authorization_scheme_param(authorization)
 
-            if not (authorization and scheme and credentials):
-                return JSONResponse(
-                    status_code=403, content={"detail": "Not authenticated"}
-                )
-            if scheme.lower() != "bearer":
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "Invalid authentication credentials"},
-                )
+class MyHMTKMiddleware:
+    """Bearer secret gate as a plain ASGI middleware.
 
-            if credentials != SECRET_KEY:
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "Invalid authentication credentials"},
-                )
+    A request carrying exactly ``Bearer <SECRET_KEY>`` is passed through
+    with a bytes comparison; anything else takes the slow path, which
+    decides between letting it through and the matching 403.
+    """
 
-        return await call_next(request)
-
-    def need_auth(self, path):
-        print(path)
-        if any(
-            path.startswith(x)
-            for x in [
-                "/docs",
-                "/openapi.json",
-                "/reset_password",
-                "/transaction/midtrans_callback",
-                "/transaction/success",
-                "/transaction/pending",
-                "/transaction/midtrans_notification",
-            ]
-        ):
-            return False
-        else:
-            return True
+    def __init__(self, app, public_prefixes=PUBLIC_PREFIXES):
+        self.app = app
+        self.public_prefixes = tuple(public_prefixes)
+        self.expected = f"Bearer {SECRET_KEY}".encode() if SECRET_KEY else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.public_prefixes):
+            return await self.app(scope, receive, send)
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+                break
+
+        if authorization is not None and authorization == self.expected:
+            return await self.app(scope, receive, send)
+
+        response = self.rejection(authorization)
+        if response is None:
+            return await self.app(scope, receive, send)
+        await response(scope, receive, send)
+
+    @staticmethod
+    def rejection(authorization):
+        authorization = authorization.decode("latin-1") if authorization else None
+        scheme, credentials = get_authorization_scheme_param(authorization)
+
+        if not (authorization and scheme and credentials):
+            return JSONResponse(status_code=403, content={"detail": "Not authenticated"})
+        if scheme.lower() != "bearer" or credentials != SECRET_KEY:
+            return JSONResponse(
+                status_code=403,
+                content={"detail": "Invalid authentication credentials"},
+            )
+        # the right secret under a differently cased scheme, e.g. "bearer"
+        return None
+
+
+def _orjson_default(obj):
+    # nested models are flattened one level at a time, orjson recurses
+    if isinstance(obj, BaseModel):
+        return dict(obj)
+    return jsonable_encoder(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, accepts pydantic models as content."""
+
+    def render(self, content):
+        return orjson.dumps(
+            content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class FastRoute(APIRoute):
+    """Route that serializes the handler's model straight to JSON.
+
+    Handlers already build their ``response_model`` from validated data, so
+    when they return exactly that model it is rendered as is instead of
+    being validated and encoded a second time by FastAPI. Anything else
+    (other types, responses, returned exceptions) takes the usual path.
+    Requests being handled are counted in the per-route in-flight gauge.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+
+        call = self.dependant.call
+        if self.response_model is None or not asyncio.iscoroutinefunction(call):
+            return
+
+        model = self.response_model
+        status_code = self.status_code or 200
+
+        @functools.wraps(call)
+        async def fast_call(**values):
+            result = await call(**values)
+            if type(result) is model:
+                return FastJSONResponse(result, status_code=status_code)
+            return result
+
+        self.dependant.call = fast_call
+        self.app = request_response(self.get_route_handler())
+
+    async def handle(self, scope, receive, send):
+        in_flight = requests_in_flight.labels(scope["method"], self.path)
+        in_flight.inc()
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            in_flight.dec()
 
 
 def hash_str(string):
@@ -113,6 +523,34 @@ def encode_jwt(payload):
     return jwt.encode(payload, SECRET, algorithm="HS256")
 
 
+def pending_expiry_cutoff():
+    # pending transactions older than this have expired on the Midtrans side
+    now = dt.datetime.now(pytz.timezone("Asia/Jakarta")).replace(tzinfo=None)
+    return now - dt.timedelta(minutes=5)
+
+
+def jakarta_naive(value):
+    # timestamps are stored as naive Asia/Jakarta time, so aware values from
+    # query strings are converted before being bound to a timestamp parameter
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(pytz.timezone("Asia/Jakarta")).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(date, id):
+    raw = json.dumps([date.isoformat(), id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, id = json.loads(raw)
+        return dt.datetime.fromisoformat(date), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Cursor tidak valid")
+
+
 def verify_signature(order_id, status_code, gross_amount, signature):
     return (
         hashlib.sha512(
@@ -139,17 +577,12 @@ https://myhmtk.jeyy.xyz/reset_password?token={token}
 You can ignore this email if this isn't you.
 """
 
-    try:
-        smtpObj = smtplib.SMTP("localhost")
-        smtpObj.sendmail(sender, receivers, message)
-        print(f"Successfully sent email to {email}")
-    except:
-        print(f"Error: unable to send email to {email}")
+    outbox.enqueue(sender, receivers, message)
 
 
 async def create_transaction(payload):
     try:
-        snap_url = snap_api.create_transaction_redirect_url(payload)
+        snap_url = await snap.create_transaction_redirect_url(payload)
         print(f'{snap_url=}')
         return snap_url
     except Exception as e: